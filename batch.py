@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script renders TrackDraw stimuli without the GUI, e.g. on compute nodes:
+
+    python batch.py manifest.json --outdir stimuli --workers 8
+
+The manifest is a JSON list of jobs, or an object with a "jobs" list and
+"defaults" applied to every job. A job may set any model.Parameters
+attribute (F0, BW, envelope, voicing, radiation, inc_ms, dur, synth_fs,
+synthesis_type) plus:
+    name     - output file stem, defaults to the job's position
+    output   - output path, overrides name and --outdir
+    tracks   - formant tracks, one row per point and one column per formant
+    formants - constant formant frequencies, used when tracks is absent
+    seed     - seed for the noise source
+
+Neither PyQt5 nor matplotlib is imported.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.io import wavfile
+import model
+from controller.synth import klatt, sine
+
+
+JOB_KEYS = ("name", "output", "tracks", "formants", "seed")
+
+
+def readmanifest(path, outdir):
+    """
+    Returns the manifest's jobs with defaults merged in and an output path
+    assigned to each.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for i, entry in enumerate(manifest["jobs"]):
+        job = dict(defaults)
+        job.update(entry)
+        job.setdefault("name", "{:04d}".format(i))
+        job.setdefault("output", os.path.join(outdir, job["name"] + ".wav"))
+        jobs.append(job)
+    return jobs
+
+
+def makeparameters(job):
+    """
+    Builds a model.Parameters instance from a manifest job.
+    """
+    parms = model.Parameters()
+    for key, value in job.items():
+        if key in JOB_KEYS:
+            continue
+        if not hasattr(parms, key):
+            raise ValueError("Unknown parameter: " + key)
+        if isinstance(value, list):
+            value = np.asarray(value, dtype=float)
+        setattr(parms, key, value)
+    if "tracks" in job:
+        parms.FF = np.asarray(job["tracks"], dtype=float)
+    else:
+        formants = np.asarray(job.get("formants", parms.FF), dtype=float)
+        parms.FF = np.ones([parms.track_npoints, 1])*formants
+    parms.BW = np.atleast_2d(np.asarray(parms.BW, dtype=float))
+    return parms
+
+
+def render(job, normalize=True):
+    """
+    Renders one job and writes it as a float32 WAV file. Runs in a pool
+    process; returns (name, n_samples, seconds, error).
+    """
+    start = time.perf_counter()
+    try:
+        parms = makeparameters(job)
+        if parms.synthesis_type == "Klatt 1980":
+            waveform = klatt.klattmake(parms.FF, parms.BW, parms.envelope,
+                                       parms.F0, parms.voicing, parms.inc_ms,
+                                       parms.dur, parms.synth_fs,
+                                       parms.radiation, job.get("seed"))
+        elif parms.synthesis_type == "Sine Wave":
+            waveform = sine.sinemake(parms.FF, parms.envelope, parms.dur,
+                                     parms.synth_fs)
+        else:
+            raise ValueError("Unknown synthesis type: " +
+                             str(parms.synthesis_type))
+        if normalize:
+            peak = np.max(np.abs(waveform)) if waveform.size else 0
+            if peak > 0:
+                waveform = waveform/peak*0.9
+        directory = os.path.dirname(job["output"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        wavfile.write(job["output"], int(parms.synth_fs),
+                      waveform.astype(np.float32))
+    except Exception as error:
+        return job["name"], 0, time.perf_counter() - start, repr(error)
+    return job["name"], waveform.size, time.perf_counter() - start, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render TrackDraw stimuli "
+                                                 "from a JSON manifest.")
+    parser.add_argument("manifest")
+    parser.add_argument("--outdir", default=".")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="jobs handed to a worker at a time")
+    parser.add_argument("--no-normalize", dest="normalize",
+                        action="store_false",
+                        help="write raw synthesizer output")
+    args = parser.parse_args(argv)
+
+    jobs = readmanifest(args.manifest, args.outdir)
+    chunksize = args.chunksize or max(1, len(jobs)//(4*args.workers))
+
+    start = time.perf_counter()
+    n_samples = 0
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = executor.map(functools.partial(render,
+                                                 normalize=args.normalize),
+                               jobs, chunksize=chunksize)
+        for name, samples, seconds, error in results:
+            if error is None:
+                n_samples += samples
+                print("{}: {} samples in {:.3f} s ({:.0f} samples/s)".format(
+                      name, samples, seconds, samples/max(seconds, 1e-9)))
+            else:
+                n_failed += 1
+                print("{}: FAILED after {:.3f} s: {}".format(name, seconds,
+                                                             error))
+    elapsed = time.perf_counter() - start
+
+    print("{} jobs ({} failed), {} samples in {:.3f} s: {:.1f} jobs/s, "
+          "{:.0f} samples/s".format(len(jobs), n_failed, n_samples, elapsed,
+                                    len(jobs)/elapsed, n_samples/elapsed))
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
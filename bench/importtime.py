@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Start-up benchmark. Imports each module in a fresh interpreter under
+python -X importtime, repeats a few times and reports the best cumulative
+import time, plus the slowest modules pulled in along the way:
+
+    python bench/importtime.py
+    python bench/importtime.py model controller.synth --repeat 10 --top 5
+
+The headless modules (the default set) are also checked against GUI and
+other heavy dependencies that they must not import; any that slip in are
+reported and make the script exit with status 1.
+
+version: 0.1.0
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported without Qt, e.g. by batch.py and on compute nodes
+HEADLESS = ("model", "controller", "controller.synth", "controller.worker",
+            "controller.loader", "controller.playback", "batch")
+
+# Top-level packages the headless modules must leave to first use
+DEFERRED = ("PyQt5", "matplotlib", "sounddevice", "numba", "scipy.signal")
+
+
+def importtime(module):
+    """
+    Imports module in a new interpreter and returns ({name: (self_us,
+    cumulative_us)}, modules) where modules lists everything imported.
+    """
+    code = ("import sys, {}; print('\\n'.join(sorted(sys.modules)))"
+            .format(module))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times, result.stdout.split()
+
+
+def measure(module, repeat):
+    """
+    Returns the best cumulative time in ms over repeat runs, the times of
+    that run and the modules it imported.
+    """
+    best = None
+    for _ in range(repeat):
+        times, modules = importtime(module)
+        total = times[module][1]/1000
+        if best is None or total < best[0]:
+            best = (total, times, modules)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure TrackDraw import "
+                                                 "times with -X importtime.")
+    parser.add_argument("modules", nargs="*", default=list(HEADLESS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0,
+                        help="also list the N slowest modules imported")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for module in args.modules:
+        total, times, modules = measure(module, args.repeat)
+        leaked = [name for name in DEFERRED if name in modules]
+        results[module] = {"ms": total, "modules": len(modules),
+                           "leaked": leaked}
+        print("{:<22} {:8.1f} ms {:5d} modules".format(module, total,
+                                                       len(modules)))
+        if module in HEADLESS and leaked:
+            failed = True
+            print("    imports " + ", ".join(leaked))
+        slowest = sorted(times.items(), key=lambda item: -item[1][0])
+        for name, (self_us, _) in slowest[:args.top]:
+            print("    {:<36} {:8.1f} ms self".format(name, self_us/1000))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the synthesis and analysis hot paths: klattmake,
+klattresonate, klattinterpolate, sinemake, specEnv and the hover STFT
+slice (model.FrameSpectra, behind Controller.stft). Every case is timed
+over several runs after a warm-up, and the peak memory of one more run is
+taken with tracemalloc. Throughput is in output samples per second; for
+specEnv it counts spectrum bins and for stft hover events.
+
+    python bench/synth.py                        # full grid
+    python bench/synth.py --quick -k klattmake   # durations up to 5 s
+    python bench/synth.py --save baseline.json
+    python bench/synth.py --compare baseline.json --threshold 0.2
+
+--compare flags cases that got slower (or use more memory) than the
+baseline by more than the threshold and exits with status 1 if any did.
+
+version: 0.1.0
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import contextlib
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model
+from controller.synth import klatt, resonator, sine, util
+
+
+DURATIONS = (0.5, 5, 60)
+SAMPLE_RATES = (10000, 22050, 48000)
+N_FORMANTS = (5, 10)
+
+
+def tracks(n_formants, Fs, n_points=40):
+    """
+    Formant and bandwidth tracks with n_formants formants spread below the
+    Nyquist frequency, the first two gliding as in a diphthong.
+    """
+    top = min(0.45*Fs, 1000*n_formants)
+    formants = np.ones([n_points, 1])*np.linspace(500, top, n_formants)
+    formants[:, 0] = np.linspace(500, 800, n_points)
+    formants[:, 1] = np.linspace(1800, 1200, n_points)
+    bandwidths = np.ones([2, 1])*np.linspace(50, 300, n_formants)
+    return formants, bandwidths
+
+
+def klattmakecase(dur, Fs, n_formants):
+    # Noise source: the fixed glottal antiresonator (1500/6000 Hz) of the
+    # voiced source is unstable above 10 kHz and would overflow to inf
+    formants, bandwidths = tracks(n_formants, Fs)
+    envelope = np.array([0, 1, 1, 1, 0])
+    def run():
+        return klatt.klattmake(formants, bandwidths, envelope, 100, 0, 5,
+                               dur, Fs, 1, rng=0)
+    return run, round(dur*Fs)
+
+
+def klattresonatecase(dur, Fs, n_formants):
+    n_samples = round(dur*Fs)
+    x = np.random.default_rng(0).standard_normal(n_samples)
+    param = np.column_stack((np.linspace(500, 800, n_samples),
+                             np.full(n_samples, 80.0)))
+    def run():
+        return klatt.klattresonate(x, param, Fs)
+    return run, n_samples
+
+
+def klattinterpolatecase(dur, Fs, n_formants):
+    formants, _ = tracks(n_formants, Fs)
+    n_samples = round(dur*Fs)
+    inc_samples = round(0.005*Fs)
+    n_inc = int(round(n_samples/inc_samples))
+    def run():
+        return klatt.klattinterpolate(formants, n_inc, inc_samples, n_samples)
+    return run, n_samples
+
+
+def sinemakecase(dur, Fs, n_formants):
+    formants, _ = tracks(n_formants, Fs)
+    envelope = np.array([0, 1, 1, 1, 0])
+    def run():
+        return sine.sinemake(formants, envelope, dur, Fs)
+    return run, round(dur*Fs)
+
+
+def specenvcase(dur, Fs, n_formants):
+    # specEnv works on one spectrum; dur sets its length here
+    n_fft = 2**int(np.ceil(np.log2(dur*Fs/64)))
+    x = np.random.default_rng(0).standard_normal(n_fft)
+    spectrum = np.fft.fft(x*np.hanning(n_fft))
+    def run():
+        # specEnv prints the quefrency index it lifters at
+        with contextlib.redirect_stdout(io.StringIO()):
+            return util.specEnv(spectrum, 100, Fs)
+    return run, n_fft
+
+
+def stftcase(dur, Fs, n_formants, n_hovers=2000):
+    # Pointer sweeps back and forth across the sound, as when hovering
+    n_samples = round(dur*Fs)
+    x = np.random.default_rng(0).standard_normal(n_samples)
+    sound = model.Sound(x, Fs, 1, "float32")
+    positions = np.abs(np.sin(np.linspace(0, 6*np.pi, n_hovers)))*n_samples
+    def run():
+        sound.waveform = x
+        spectra = sound.spectra
+        for position in positions:
+            spectrum = spectra.spectrum(position)
+        return spectrum
+    return run, n_hovers
+
+
+# name: (case factory, parameters it varies)
+CASES = {"klattmake": (klattmakecase, ("dur", "fs", "nf")),
+         "klattresonate": (klattresonatecase, ("dur", "fs")),
+         "klattinterpolate": (klattinterpolatecase, ("dur", "fs", "nf")),
+         "sinemake": (sinemakecase, ("dur", "fs", "nf")),
+         "specEnv": (specenvcase, ("dur", "fs")),
+         "stft": (stftcase, ("dur", "fs"))}
+
+
+def cases(durations, pattern=None):
+    """
+    Yields (case name, factory, arguments) over the parameter grid.
+    """
+    for name, (factory, varies) in CASES.items():
+        grid = itertools.product(durations, SAMPLE_RATES,
+                                 N_FORMANTS if "nf" in varies else (5,))
+        for dur, Fs, n_formants in grid:
+            labels = {"dur": dur, "fs": Fs, "nf": n_formants}
+            label = "{}[{}]".format(name, ",".join(
+                "{}={}".format(key, labels[key]) for key in varies))
+            if pattern is None or pattern in label:
+                yield label, factory, (dur, Fs, n_formants)
+
+
+def measure(factory, args, repeat):
+    """
+    Returns (best seconds, samples per second, peak traced bytes). The
+    output must be finite; timing an overflow would be meaningless.
+    """
+    run, n_samples = factory(*args)
+    assert np.isfinite(run()).all(), "non-finite output"
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return best, n_samples/best, peak
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the labels of cases that regressed against baseline.
+    """
+    regressions = []
+    for label, result in results.items():
+        old = baseline.get("results", {}).get(label)
+        if old is None:
+            continue
+        slower = result["seconds"] > old["seconds"]*(1 + threshold)
+        larger = result["peak_bytes"] > old["peak_bytes"]*(1 + threshold)
+        if slower or larger:
+            regressions.append(label)
+            print("REGRESSION {}: {:.4f} s -> {:.4f} s, {:.1f} MB -> {:.1f} MB"
+                  .format(label, old["seconds"], result["seconds"],
+                          old["peak_bytes"]/2**20,
+                          result["peak_bytes"]/2**20))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TrackDraw "
+                                                 "synthesis and analysis "
+                                                 "hot paths.")
+    parser.add_argument("-k", dest="pattern",
+                        help="only run cases whose label contains this")
+    parser.add_argument("--quick", action="store_true",
+                        help="skip the 60 s durations")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="auto",
+                        choices=resonator.BACKENDS,
+                        help="resonator kernel, see resonator.setbackend()")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check "
+                                          "against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown or memory growth (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    resonator.setbackend(args.backend)
+    durations = tuple(d for d in DURATIONS if d <= 5) if args.quick\
+                else DURATIONS
+
+    results = {}
+    print("{:<44} {:>10} {:>14} {:>10}".format("case", "best [s]",
+                                               "samples/s", "peak [MB]"))
+    for label, factory, case_args in cases(durations, args.pattern):
+        seconds, rate, peak = measure(factory, case_args, args.repeat)
+        results[label] = {"seconds": seconds, "samples_per_s": rate,
+                          "peak_bytes": peak}
+        print("{:<44} {:>10.4f} {:>14,.0f} {:>10.1f}".format(
+              label, seconds, rate, peak/2**20))
+
+    report = {"python": platform.python_version(),
+              "numpy": np.__version__,
+              "machine": platform.machine(),
+              "backend": args.backend,
+              "results": results}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The controller is initialized here. Put general description here.
+
+authors: A. Y. Cho and Daniel R Guest
+date:    07/17/2016
+version: 0.1.0
+"""
+
+import copy
+import controller.instrument as instrument
+import controller.playback as playback
+import controller.scheduler as scheduler
+import controller.worker as worker
+from controller.synth import cache, incremental, stream
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QFileDialog, QMessageBox
+
+
+class WorkerSignals(QtCore.QObject):
+    """
+    Carries worker callbacks from the pool threads to the GUI thread.
+    """
+    finished = QtCore.pyqtSignal(object, object)
+    progress = QtCore.pyqtSignal(object, float)
+    failed = QtCore.pyqtSignal(object, object)
+    # Streamed playback runs its own producer thread, see StreamSource
+    playbackFailed = QtCore.pyqtSignal(object)
+
+
+class Controller:
+    """
+    Helpful docstring
+    """
+    def __init__(self, model, view):
+        self.model = model
+        self.view  = view
+        self.appWindow = view.appWindow
+
+        # Background jobs report back through Qt signals
+        self.signals = WorkerSignals()
+        self.signals.finished.connect(self.jobFinished)
+        self.signals.progress.connect(self.jobProgress)
+        self.signals.failed.connect(self.jobFailed)
+        self.signals.playbackFailed.connect(self.playbackFailed)
+        self.worker = worker.Worker(self.signals.finished.emit,
+                                    self.signals.progress.emit,
+                                    self.signals.failed.emit)
+
+        # Callbacks for menu items
+        def file_menu_open():
+            fname = QFileDialog.getOpenFileName(self.appWindow, "Open file")
+            if fname[0]:
+                new_fs = model.default_parms.resample_fs
+                sound = model.loaded_sound
+                self.worker.submit("load", worker.load, fname[0], new_fs,
+                                   sound.storage, sound.scratch)
+        def file_menu_quit():
+            self.appWindow.close()
+        def help_menu_about():
+            QMessageBox.about(self.appWindow, "About",\
+"""
+<b>TrackDraw v0.1.0</b>
+Copyright (c) 2016 Adrian Y. Cho and Daniel R Guest
+""")
+
+        # Bind the menu callbacks
+        self.appWindow.file_menu.addAction("&Open file", file_menu_open,\
+                                           QtCore.Qt.CTRL + QtCore.Qt.Key_O)
+        self.appWindow.file_menu.addAction('&Quit', file_menu_quit,\
+                                           QtCore.Qt.CTRL + QtCore.Qt.Key_Q)
+        self.appWindow.help_menu.addAction('&About', help_menu_about)
+
+        # Mouse-driven updates are coalesced and applied on a timer tick
+        self.redraw_timer = QtCore.QTimer()
+        self.redraw_timer.setSingleShot(True)
+        self.scheduler = scheduler.RedrawScheduler(60, self.redraw_timer)
+        self.redraw_timer.timeout.connect(self.scheduler.tick)
+        self.scheduler.connect("drag", self.applyDrag)
+        self.scheduler.connect("stft", self.applySTFT)
+
+        # Bind the spectrogram canvas callbacks
+        self.appWindow.spec_cv.mpl_connect('button_press_event', self.click)
+        self.appWindow.spec_cv.mpl_connect('motion_notify_event', self.drag)
+        self.appWindow.spec_cv.mpl_connect('motion_notify_event', self.stft)
+        self.appWindow.spec_cv.mpl_connect('scroll_event', self.zoom)
+        
+        # Callbacks for buttons
+        def plot_loaded_callback():
+            self.plot_tag = "loaded"
+            self.plot()
+            
+        def plot_synth_callback():
+            self.plot_tag = "synth"
+            self.plot()
+            
+        def play_loaded_callback():
+            self.play_tag = "loaded"
+            self.play()
+            
+        def play_synth_callback():
+            self.play_tag = "synth"
+            self.play()
+            
+        def default_callback():
+            self.appWindow.setDefaults()
+            update_parms_callback()
+        
+        # Bind the button callbacks
+        self.appWindow.plot_loaded_but.clicked.connect(plot_loaded_callback)
+        self.appWindow.synth_but.clicked.connect(self.synth)
+        self.appWindow.plot_synth_but.clicked.connect(plot_synth_callback)
+        self.appWindow.play_loaded_but.clicked.connect(play_loaded_callback)
+        self.appWindow.play_synth_but.clicked.connect(play_synth_callback)
+        self.appWindow.default_but.clicked.connect(default_callback)
+        
+        # Callbacks for sliders/checkboxes
+            
+        def update_parms_callback():
+            self.model.current_parms.window_len = self.appWindow.fft_length_slider.value()
+            self.model.current_parms.F0 = self.appWindow.f0_slider.value()
+            self.model.current_parms.dur = 0.5*self.appWindow.dur_slider.value()
+            if self.appWindow.voicing_check.checkState() == 0:
+                self.model.current_parms.voicing = 0
+            elif self.appWindow.voicing_check.checkState() == 2:
+                self.model.current_parms.voicing = 1
+            if self.appWindow.radiation_check.checkState() == 0:
+                self.model.current_parms.radiation = 0
+            elif self.appWindow.radiation_check.checkState() == 2:
+                self.model.current_parms.radiation = 1
+            self.model.current_parms.BW[0:1,0] = self.appWindow.bw1_slider.value()
+            self.model.current_parms.BW[0:1,1] = self.appWindow.bw2_slider.value()
+            self.model.current_parms.BW[0:1,2] = self.appWindow.bw3_slider.value()
+            self.model.current_parms.BW[0:1,3] = self.appWindow.bw4_slider.value()
+            self.model.current_parms.BW[0:1,4] = self.appWindow.bw5_slider.value()
+            self.model.current_parms.synthesis_type = self.appWindow.synth_dropdown.currentText()
+            self.cancelStaleSynth()
+            self.plot()
+            
+        # Bind the slider/checkbox/combobox callbacks
+        self.appWindow.fft_length_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.voicing_check.stateChanged.connect(update_parms_callback)
+        self.appWindow.f0_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.dur_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.radiation_check.stateChanged.connect(update_parms_callback)
+        self.appWindow.bw1_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.bw2_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.bw3_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.bw4_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.bw5_slider.sliderReleased.connect(update_parms_callback)
+        self.appWindow.synth_dropdown.currentIndexChanged.connect(update_parms_callback)
+        
+        # Send default tracks to view, create useful plotting attributes
+        self.appWindow.spec_cv.startTracks(self.model.tracks)
+        self.locked_track = 0
+        self.x_high = 39
+        self.plot_tag = "loaded"
+        self.play_tag = "loaded"
+        self.plotted = None
+        self.player = playback.Player()
+        self.synth_cache = cache.SynthCache()
+        # Fingerprint of the parameters synth_sound was synthesized from
+        self.synth_key = None
+        self.incremental = incremental.IncrementalKlatt()
+        update_parms_callback()
+            
+    @instrument.timed("click")
+    def click(self, event):
+        """
+        When an area in the main canvas is clicked, mouse() returns the click's
+        location in terms of the data dimensions if the click was within the
+        plot region. This location is passed to model by updateTrackClick(), 
+        which finds the nearest track/vertex to the click and updates the track
+        data accordingly. Data from the updated track is then passed to the view,
+        which updates the appropriate track in the view and redraws everything.
+        At the end, the selected track is stored in locked_track, which drag()
+        uses to lock to a particular track for a given click-drag movement.
+        Pending drags are applied first so they keep their order.
+        """
+        try:
+            x_loc, y_loc = self.appWindow.spec_cv.mouse(event)
+            self.scheduler.flush()
+            trackNo, updated_track = self.model.updateTrackClick(x_loc, y_loc,\
+                                                                 self.x_high)
+            self.appWindow.spec_cv.updateTrack(trackNo, updated_track)
+            self.appWindow.spec_cv.redrawTracks()
+            self.locked_track = trackNo
+            self.cancelStaleSynth()
+        except TypeError:
+            self.scheduler.drop()
+    
+    def drag(self, event):
+        """
+        Similar functionality to click() above, except chooses the
+        locked_track-th track instead of the closest to the mouse, and does not
+        update the locked_track. Only the latest position for each vertex is
+        kept until the next scheduler tick applies it in applyDrag().
+        """
+        if event.button:
+            try:
+                x_loc, y_loc = self.appWindow.spec_cv.mouse(event)
+                vertex = self.model.nearestVertex(x_loc, self.x_high)
+                self.scheduler.post("drag", (self.locked_track, vertex), y_loc)
+            except TypeError:
+                self.scheduler.drop()
+
+    @instrument.timed("drag")
+    def applyDrag(self, key, y_loc):
+        trackNo, vertex = key
+        trackNo, updated_track = self.model.updateTrackVertex(trackNo, vertex,
+                                                              y_loc)
+        self.appWindow.spec_cv.updateTrack(trackNo, updated_track)
+        self.cancelStaleSynth()
+        return self.appWindow.spec_cv.redrawTracks
+            
+    def stft(self, event):
+        """
+        Queues the spectrum of the frame under the pointer; applySTFT()
+        shows the latest one on the next scheduler tick.
+        """
+        if self.appWindow.stft_check.checkState() == 2:
+            try:
+                x_loc, y_loc = self.appWindow.spec_cv.mouse(event)
+                self.scheduler.post("stft", None, x_loc)
+            except TypeError:
+                self.scheduler.drop()
+
+    @instrument.timed("stft")
+    def applySTFT(self, key, x_loc):
+        """
+        Spectra come from the sound's FrameSpectra, so hovering over the
+        same spot again costs a lookup.
+        """
+        sound = self.getSound(self.plot_tag)
+        if sound.nsamples == 0:
+            return
+        stspec = sound.spectra.spectrum(x_loc*sound.fs)
+        self.appWindow.stft_cv.updateSTFT(stspec)
+        return self.appWindow.stft_cv.redrawSTFT
+            
+    def setTrackNpoints(self, track_npoints):
+        """
+        Resamples the tracks to track_npoints points and redraws them.
+        """
+        self.scheduler.flush()
+        self.model.setTrackNpoints(track_npoints)
+        for trackNo, track in enumerate(self.model.tracks):
+            self.appWindow.spec_cv.updateTrack(trackNo, track.points)
+        self.appWindow.spec_cv.redrawTracks()
+
+    @instrument.timed("synth")
+    def synth(self):
+        """
+        Snapshots the current parameters and synthesizes them in the
+        background; jobFinished() stores the result in synth_sound. Settings
+        that were synthesized before are served from synth_cache instead, and
+        Klatt renders after a track edit only redo the affected region.
+        """
+        parms = self.currentParms()
+        key = cache.fingerprint(parms)
+        waveform = self.synth_cache.get(key)
+        if waveform is not None:
+            self.worker.cancel("synth")
+            self.model.synth_sound.waveform = waveform
+            self.synth_key = key
+            self.appWindow.statusBar().showMessage("Synthesis finished (cached)")
+            return
+        job = self.worker.submit("synth", worker.synthesize, parms, 16384,
+                                 self.incremental)
+        job.tag = key
+
+    def cancelStaleSynth(self):
+        """
+        Cancels the synthesis in progress if the parameters it renders
+        (cache.FINGERPRINT_FIELDS) no longer match the current ones, e.g.
+        after a slider change or a track edit. Costs a dictionary lookup
+        while nothing is being synthesized.
+        """
+        job = self.worker.current("synth")
+        if job is None or job.tag == cache.fingerprint(self.currentParms()):
+            return
+        self.worker.cancel("synth")
+        self.appWindow.statusBar().showMessage("Synthesis cancelled")
+
+    def currentParms(self):
+        """
+        Returns a snapshot of the current parameters with the tracks in FF.
+        """
+        self.model.current_parms.FF = self.model.getTracks()
+        return copy.deepcopy(self.model.current_parms)
+
+    def getSound(self, tag):
+        if tag == "loaded":
+            return self.model.loaded_sound
+        elif tag == "synth":
+            return self.model.synth_sound
+
+    @instrument.timed("plot")
+    def plot(self):
+        """
+        Shows the spectrogram of the selected sound over the current view.
+        Spectrograms the model has cached are drawn right away; anything
+        else is computed in the background and drawn by jobFinished(). For
+        long sounds only the tiles of the view are computed.
+        """
+        sound = self.getSound(self.plot_tag)
+        if sound.nsamples == 0:
+            return
+        spec_cv = self.appWindow.spec_cv
+        if self.plotted == (sound, sound.version):
+            x_low, x_high = spec_cv.viewLimits()
+        else:
+            # A new sound is shown whole
+            spec_cv.x_view = None
+            x_low, x_high = 0, sound.nsamples/sound.fs
+        view = (x_low, x_high, spec_cv.viewColumns())
+        window_len = self.model.current_parms.window_len
+        key = self.model.spectrogramKey(sound, window_len)
+        spec = self.model.getSpectrogram(key, sound.data, compute=False)
+        if spec is not None:
+            image = spec.view(*view, compute=False)
+            if image is not None:
+                self.worker.cancel("plot")
+                self.drawPlot(image)
+                return
+        self.worker.submit("plot", worker.spectrogram, self.model, key,
+                           sound.data, sound.scale, view)
+
+    @instrument.timed("plot.draw")
+    def drawPlot(self, spec):
+        sound = self.getSound(self.plot_tag)
+        if not self.appWindow.spec_cv.updateSpectrogram(spec,
+                                                        "gist_heat"):
+            # Already on screen; only the tracks need to be blitted
+            self.appWindow.spec_cv.redrawTracks()
+            return
+        
+        self.x_high = sound.nsamples/sound.fs
+        self.appWindow.spec_cv.x_high = self.x_high
+        self.appWindow.spec_cv.rescaleTracks()
+
+        if self.plotted == (sound, sound.version):
+            return
+        self.plotted = (sound, sound.version)
+        self.drawWave()
+
+    def drawWave(self):
+        """
+        Shows the plotted sound's waveform over the spectrogram's time span.
+        """
+        if self.plotted is None:
+            return
+        sound, _ = self.plotted
+        x_low, x_high = self.appWindow.spec_cv.viewLimits()
+        self.appWindow.wave_cv.updateWaveform(sound.overview, x_low*sound.fs,
+                                              x_high*sound.fs)
+
+    def zoom(self, event):
+        """
+        Scrolling over the spectrogram zooms the time axis around the
+        pointer; with shift held it pans instead. The new view is shown
+        stretched right away and re-plotted at the matching resolution.
+        """
+        spec_cv = self.appWindow.spec_cv
+        try:
+            x_loc, _ = spec_cv.mouse(event)
+        except TypeError:
+            return
+        x_low, x_high = spec_cv.viewLimits()
+        if event.key == "shift":
+            shift = -0.1*event.step*(x_high - x_low)
+            spec_cv.setView(x_low + shift, x_high + shift)
+        else:
+            scale = 0.8**event.step
+            spec_cv.setView(x_loc - (x_loc - x_low)*scale,
+                            x_loc + (x_high - x_loc)*scale)
+        self.drawWave()
+        self.plot()
+
+    def jobFinished(self, job, result):
+        if job.cancelled:
+            return
+        if job.kind == "synth":
+            # Cache the stored form so later hits need no conversion
+            self.model.synth_sound.waveform = result
+            self.synth_key = job.tag
+            self.synth_cache.put(job.tag, self.model.synth_sound.data)
+            self.appWindow.statusBar().showMessage("Synthesis finished")
+        elif job.kind == "plot":
+            self.drawPlot(result)
+            self.appWindow.statusBar().clearMessage()
+        elif job.kind == "load":
+            sound = self.model.loaded_sound
+            sound.adopt(result)
+            self.appWindow.wave_cv.updateWaveform(sound.overview, 0,
+                                                  sound.nsamples)
+            self.appWindow.statusBar().showMessage("File loaded")
+
+    def jobProgress(self, job, fraction):
+        if job.cancelled:
+            return
+        if job.kind == "synth":
+            self.appWindow.statusBar().showMessage(
+                "Synthesizing... {:.0%}".format(fraction))
+        elif job.kind == "load":
+            self.appWindow.statusBar().showMessage(
+                "Loading... {:.0%}".format(fraction))
+
+    def jobFailed(self, job, error):
+        self.appWindow.statusBar().showMessage(
+            "{} failed: {}".format(job.kind.capitalize(), error))
+        
+    def playbackFailed(self, error):
+        self.appWindow.statusBar().showMessage(
+            "Playback failed: {}".format(error))
+
+    def play(self):
+        """
+        Plays the stored samples directly; ArraySource normalizes to the
+        peak, which makes the storage scale irrelevant. If synth_sound is
+        stale and the current parameters are not cached, they are streamed
+        instead, so playback starts after one block rather than the full
+        render.
+        """
+        if self.play_tag == "synth":
+            parms = self.currentParms()
+            key = cache.fingerprint(parms)
+            if key != self.synth_key:
+                waveform = self.synth_cache.get(key)
+                if waveform is None:
+                    source = playback.StreamSource(
+                        stream.synthengine(parms),
+                        failed=self.signals.playbackFailed.emit)
+                    self.player.play(source, parms.synth_fs)
+                    return
+                self.model.synth_sound.waveform = waveform
+                self.synth_key = key
+        sound = self.getSound(self.play_tag)
+        if sound.nsamples == 0:
+            return
+        self.player.play(playback.ArraySource(sound.data), sound.fs)
+            
+    def run(self):
+        self.appWindow.show()
+        self.view.exec_()
+        self.worker.shutdown()
+
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing instrumentation. Pipeline stages and UI handlers are wrapped
+in stage() blocks or @timed; while instrumentation is disabled (the
+default) these cost one global check and record nothing. Once enabled,
+each stage records its wall time, the samples it produced and, with
+memory=True, the most memory it allocated on top of what was live when it
+started (the tracemalloc peak, reset at every stage).
+
+    from controller import instrument
+    instrument.enable()
+    ...                                  # synthesize, plot, hover, ...
+    print(instrument.summary())
+    instrument.export("trace.json")      # chrome://tracing / Perfetto
+
+Setting TRACKDRAW_PROFILE=trace.json in the environment enables it at
+start-up and exports the trace when the interpreter exits.
+
+version: 0.1.0
+"""
+
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+import tracemalloc
+from collections import deque
+import numpy as np
+
+
+enabled = False
+memory = False
+# Whether enable() started tracemalloc, and so disable() should stop it
+started_tracing = False
+
+# Per-thread stack of open memory-tracing stages
+local = threading.local()
+
+# (name, start_ns, duration_ns, bytes, samples, thread id), oldest first
+events = deque(maxlen=1000000)
+
+
+class Stage:
+    """
+    Records one event when its with block exits. Set samples inside the
+    block if the count is only known there.
+    """
+    __slots__ = ("name", "samples", "start", "memory_start", "peak")
+
+    def __init__(self, name, samples=0):
+        self.name = name
+        self.samples = samples
+
+    def __enter__(self):
+        if memory:
+            self.enterMemory()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+        nbytes = self.exitMemory() if memory else 0
+        events.append((self.name, self.start, duration, nbytes, self.samples,
+                       threading.get_ident()))
+        return False
+
+    def enterMemory(self):
+        # Resetting the peak would hide what an enclosing stage allocated
+        # so far, so hand that peak to it first
+        stack = getattr(local, "stack", None)
+        if stack is None:
+            stack = local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self.memory_start = current
+        self.peak = current
+        stack.append(self)
+
+    def exitMemory(self):
+        stack = local.stack
+        if stack and stack[-1] is self:
+            stack.pop()
+        peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        return peak - self.memory_start
+
+
+class NullStage:
+    """
+    Stands in for Stage while instrumentation is disabled.
+    """
+    __slots__ = ()
+    samples = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+def stage(name, samples=0):
+    """
+    Returns a context manager timing the block it wraps as stage name.
+    """
+    if not enabled:
+        return NULL_STAGE
+    return Stage(name, samples)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as stage name.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(trace_memory=False):
+    """
+    Starts recording. trace_memory also starts tracemalloc, which slows
+    down everything that allocates.
+    """
+    global enabled, memory, started_tracing
+    memory = trace_memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    enabled = True
+
+
+def disable():
+    """
+    Stops recording, and stops tracemalloc if enable() started it.
+    """
+    global enabled, memory, started_tracing
+    enabled = False
+    if started_tracing:
+        tracemalloc.stop()
+        started_tracing = False
+    memory = False
+
+
+def reset():
+    events.clear()
+
+
+def histogram(name, bins=None):
+    """
+    Returns (counts, edges) of the durations of stage name in seconds. The
+    default bins are logarithmic, 4 per decade from 1 us to 100 s.
+    """
+    durations = np.array([event[2] for event in list(events)
+                          if event[0] == name])*1e-9
+    if bins is None:
+        bins = np.logspace(-6, 2, 33)
+    return np.histogram(durations, bins)
+
+
+def summary():
+    """
+    Returns per-stage statistics: count, total/mean/min/max and median and
+    90th percentile time in seconds, bytes, samples and samples per second.
+    """
+    by_name = {}
+    for name, _, duration, nbytes, samples, _ in list(events):
+        by_name.setdefault(name, []).append((duration, nbytes, samples))
+    stats = {}
+    for name, records in by_name.items():
+        durations = np.array([record[0] for record in records])*1e-9
+        total = durations.sum()
+        samples = sum(record[2] for record in records)
+        stats[name] = {"count": len(records),
+                       "total": total,
+                       "mean": durations.mean(),
+                       "min": durations.min(),
+                       "median": np.percentile(durations, 50),
+                       "p90": np.percentile(durations, 90),
+                       "max": durations.max(),
+                       "bytes": sum(record[1] for record in records),
+                       "samples": samples,
+                       "samples_per_s": samples/total if total > 0 else 0.0}
+    return stats
+
+
+def export(path, fmt="trace"):
+    """
+    Writes the recorded events to path, either as a Trace Event Format file
+    (fmt="trace", for chrome://tracing or Perfetto) or as summary() plus
+    the histogram of every stage (fmt="json").
+    """
+    if fmt == "trace":
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "ts": start/1000,
+                  "dur": duration/1000, "pid": pid, "tid": tid,
+                  "args": {"bytes": nbytes, "samples": samples}}
+                 for name, start, duration, nbytes, samples, tid
+                 in list(events)]
+        report = {"traceEvents": trace, "displayTimeUnit": "ms"}
+    elif fmt == "json":
+        stats = summary()
+        for name in stats:
+            counts, edges = histogram(name)
+            stats[name]["histogram"] = {"counts": counts.tolist(),
+                                        "edges": edges.tolist()}
+        report = {"stages": stats}
+    else:
+        raise ValueError("Unknown export format: " + str(fmt))
+    with open(path, "w") as f:
+        json.dump(report, f)
+
+
+if os.environ.get("TRACKDRAW_PROFILE"):
+    enable(bool(os.environ.get("TRACKDRAW_PROFILE_MEMORY")))
+    atexit.register(export, os.environ["TRACKDRAW_PROFILE"])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chunked WAV loading. The file is memory-mapped where the format allows
+it, and each chunk is downmixed to mono and resampled on its own, so only
+the output and a few chunks of intermediates are ever in memory.
+
+version: 0.1.0
+"""
+
+from fractions import Fraction
+import numpy as np
+from controller.synth import util
+
+signal = util.lazyimport("scipy.signal")
+wavfile = util.lazyimport("scipy.io.wavfile")
+
+
+class PolyphaseResampler:
+    """
+    Rational resampler fed one chunk at a time. It uses the same
+    Kaiser-windowed FIR filter and alignment as scipy.signal.resample_poly,
+    so the concatenated output of process() and flush() matches
+    resample_poly() on the whole signal. The last taps-1 input samples are
+    carried between chunks.
+    """
+    def __init__(self, old_fs, new_fs, window=("kaiser", 5.0)):
+        ratio = Fraction(int(new_fs), int(old_fs))
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+
+        # Filter design as in resample_poly()
+        max_rate = max(self.up, self.down)
+        self.half_len = 10*max_rate
+        h = signal.firwin(2*self.half_len + 1, 1/max_rate, window=window)
+        h = h*self.up
+
+        # One row of taps per phase, newest input sample first
+        self.n_taps = -(-len(h)//self.up)
+        h = np.concatenate((h, np.zeros([self.n_taps*self.up - len(h)])))
+        self.phases = h.reshape(self.n_taps, self.up).T
+
+        self.history = np.zeros([self.n_taps - 1])
+        self.n_in = 0
+        self.n_out = 0
+
+    def outputs(self, n_in):
+        """
+        Number of output samples for n_in input samples.
+        """
+        return -(-n_in*self.up//self.down)
+
+    def convolve(self, x, n_available, n_target):
+        """
+        Computes the outputs whose newest input sample is at most index
+        n_available - 1 (of the whole signal), up to n_target in total.
+        """
+        buffer = np.concatenate((self.history, x))
+        offset = self.n_in - len(self.history)
+
+        # Output n needs inputs up to (n*down + half_len)//up
+        last = (n_available*self.up - self.half_len - 1)//self.down + 1
+        last = min(max(last, self.n_out), n_target)
+        n = np.arange(self.n_out, last)
+        t = n*self.down + self.half_len
+        newest = t//self.up - offset
+        windows = np.lib.stride_tricks.sliding_window_view(buffer,
+                                                           self.n_taps)
+        frames = windows[newest - self.n_taps + 1][:, ::-1]
+        y = np.einsum("ij,ij->i", frames, self.phases[t%self.up])
+
+        self.n_out = last
+        self.n_in += len(x)
+        keep = len(self.history)
+        self.history = buffer[len(buffer)-keep:] if keep else buffer[:0]
+        return y
+
+    def process(self, x):
+        """
+        Feeds a chunk and returns the output it completes.
+        """
+        x = np.asarray(x, dtype=float)
+        return self.convolve(x, self.n_in + len(x), np.inf)
+
+    def flush(self):
+        """
+        Returns the remaining output, treating the signal as zero past its
+        end.
+        """
+        n_target = self.outputs(self.n_in)
+        n_pad = (n_target*self.down + self.half_len)//self.up - self.n_in + 1
+        n_pad = max(n_pad, 0)
+        n_signal = self.n_in
+        y = self.convolve(np.zeros([n_pad]), n_signal + n_pad, n_target)
+        self.n_in = n_signal
+        return y
+
+
+def readwav(path):
+    """
+    Returns (fs, data) with data memory-mapped when the format allows.
+    """
+    try:
+        return wavfile.read(path, mmap=True)
+    except ValueError:
+        # e.g. 24-bit files, which wavfile cannot map
+        return wavfile.read(path)
+
+
+def loadwav(path, fs, chunk_size=65536, report=None):
+    """
+    Reads a WAV file as a mono float waveform at sample rate fs. Channels
+    are averaged. report, if given, is called with the fraction read after
+    every chunk.
+    """
+    old_fs, data = readwav(path)
+    n_in = data.shape[0]
+    resampler = PolyphaseResampler(old_fs, fs) if old_fs != fs else None
+    n_out = resampler.outputs(n_in) if resampler else n_in
+    waveform = np.empty([n_out])
+
+    position = 0
+    for start in range(0, n_in, chunk_size):
+        chunk = np.asarray(data[start:start+chunk_size], dtype=float)
+        if chunk.ndim > 1:
+            chunk = chunk.mean(axis=1)
+        if resampler:
+            chunk = resampler.process(chunk)
+        waveform[position:position+len(chunk)] = chunk
+        position += len(chunk)
+        if report is not None:
+            report(min(start + chunk_size, n_in)/n_in)
+    if resampler:
+        chunk = resampler.flush()
+        waveform[position:position+len(chunk)] = chunk
+    del data
+    return waveform, fs
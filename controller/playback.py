@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Callback-driven audio playback. Audio is pulled from a source a block at a
+time inside the output stream's callback, so playback starts as soon as the
+first block is available and never needs a normalized copy of the waveform.
+The callback only ever copies samples; streamed synthesis is rendered ahead
+of it on a producer thread.
+
+version: 0.1.0
+"""
+
+import threading
+import numpy as np
+from controller.synth import stream
+
+
+class Player:
+    """
+    Plays ArraySource/StreamSource objects through backend.OutputStream.
+    backend defaults to the sounddevice module; pass a NullBackend to run
+    without an audio device (e.g. in headless tests).
+    """
+    def __init__(self, backend=None, blocksize=1024):
+        self.backend = backend
+        self.blocksize = blocksize
+        self.source = None
+        self.stream = None
+
+    def play(self, source, fs):
+        self.stop()
+        if self.backend is None:
+            import sounddevice
+            self.backend = sounddevice
+        self.source = source
+        self.source.start()
+        self.stream = self.backend.OutputStream(samplerate=fs,
+                                                blocksize=self.blocksize,
+                                                channels=1,
+                                                dtype="float32",
+                                                callback=self.callback)
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if self.source is not None:
+            self.source.stop()
+
+    @property
+    def playing(self):
+        return self.stream is not None and self.stream.active
+
+    def callback(self, outdata, frames, time, status):
+        n = self.source.read(outdata[:, 0])
+        if n < frames:
+            outdata[n:] = 0
+            # Short reads of a source that is not done are underruns
+            if self.source.done:
+                raise self.backend.CallbackStop
+
+
+class ArraySource:
+    """
+    Reads blocks from an existing waveform. If gain is None, the waveform is
+    scaled so its peak sits at 0.9, as Controller.play() always did; the
+    scaling is applied per block rather than to a full copy.
+    """
+    def __init__(self, waveform, gain=None):
+        self.waveform = waveform
+        self.position = 0
+        if gain is None:
+            peak = max(np.max(waveform), -np.min(waveform))
+            gain = 0.9/peak if peak > 0 else 0.0
+        self.gain = gain
+
+    @property
+    def done(self):
+        return self.position >= len(self.waveform)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def read(self, out):
+        chunk = self.waveform[self.position:self.position+len(out)]
+        n = len(chunk)
+        np.multiply(chunk, self.gain, out=out[:n], casting="unsafe")
+        self.position += n
+        return n
+
+
+class StreamSource:
+    """
+    Plays a KlattStream or SineStream engine (see controller.synth.stream).
+    start() launches a producer thread that renders blocks into a ring
+    buffer ahead of playback, so read(), which runs in the output callback,
+    only copies samples out. The peak of a streamed waveform is not known in
+    advance; unless gain is given, the producer first sets it so that
+    stream.peakestimate() maps to level. The clip to [-1, 1] only guards
+    against an estimate that came out low.
+
+    If rendering fails, the source ends early, the exception is kept in
+    error and failed(error) is called from the producer thread.
+    """
+    def __init__(self, engine, gain=None, level=0.9, block_size=4096,
+                 capacity=16384, failed=None):
+        self.engine = engine
+        self.failed = failed
+        self.error = None
+        self.gain = gain
+        self.level = level
+        self.block_size = block_size
+        self.ring = RingBuffer(capacity)
+        self.lock = threading.Condition()
+        self.exhausted = False
+        self.stopped = False
+        self.thread = None
+
+    @property
+    def done(self):
+        with self.lock:
+            return self.exhausted and self.ring.count == 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify()
+
+    def produce(self):
+        """
+        Producer thread: renders the engine block by block, waiting for
+        space in the ring buffer whenever it is full. The source is marked
+        exhausted however this ends, so the callback always stops.
+        """
+        try:
+            if self.gain is None:
+                peak = stream.peakestimate(self.engine)
+                self.gain = self.level/peak if peak > 0 else 0.0
+            while not self.engine.done:
+                block = np.clip(self.engine.render(self.block_size)*self.gain,
+                                -1, 1)
+                while len(block) > 0:
+                    with self.lock:
+                        while self.ring.space == 0 and not self.stopped:
+                            self.lock.wait()
+                        if self.stopped:
+                            return
+                        n = self.ring.write(block)
+                    block = block[n:]
+        except Exception as error:
+            self.error = error
+            if self.failed is not None:
+                self.failed(error)
+        finally:
+            with self.lock:
+                self.exhausted = True
+
+    def read(self, out):
+        with self.lock:
+            n = self.ring.read(out)
+            self.lock.notify()
+        return n
+
+
+class RingBuffer:
+    """
+    Fixed-capacity single-channel FIFO. write() and read() copy as much as
+    fits and return the number of samples moved.
+    """
+    def __init__(self, capacity):
+        self.data = np.zeros([capacity], dtype=np.float32)
+        self.start = 0
+        self.count = 0
+
+    @property
+    def space(self):
+        return len(self.data) - self.count
+
+    def write(self, x):
+        n = min(len(x), self.space)
+        end = (self.start + self.count)%len(self.data)
+        first = min(n, len(self.data) - end)
+        self.data[end:end+first] = x[:first]
+        self.data[:n-first] = x[first:n]
+        self.count += n
+        return n
+
+    def read(self, out):
+        n = min(len(out), self.count)
+        first = min(n, len(self.data) - self.start)
+        out[:first] = self.data[self.start:self.start+first]
+        out[first:n] = self.data[:n-first]
+        self.start = (self.start + n)%len(self.data)
+        self.count -= n
+        return n
+
+
+class NullBackend:
+    """
+    Drop-in replacement for the sounddevice module that plays nothing. Each
+    NullStream records what the callback produced in its output list; call
+    pump() to drive the callback the way an audio thread would.
+    """
+    class CallbackStop(Exception):
+        pass
+
+    def __init__(self):
+        self.streams = []
+
+    def OutputStream(self, samplerate, blocksize, channels, dtype, callback):
+        stream = NullStream(samplerate, blocksize, channels, dtype, callback,
+                            self.CallbackStop)
+        self.streams.append(stream)
+        return stream
+
+
+class NullStream:
+    def __init__(self, samplerate, blocksize, channels, dtype, callback,
+                 stop_exception):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.stop_exception = stop_exception
+        self.active = False
+        self.output = []
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+    def pump(self, n_callbacks=None):
+        """
+        Runs the callback until it stops (or n_callbacks times) and returns
+        everything played so far as one array.
+        """
+        calls = 0
+        while self.active and (n_callbacks is None or calls < n_callbacks):
+            outdata = np.zeros([self.blocksize, self.channels],
+                               dtype=self.dtype)
+            calls += 1
+            try:
+                self.callback(outdata, self.blocksize, None, None)
+            except self.stop_exception:
+                self.active = False
+            self.output.append(outdata[:, 0])
+        if not self.output:
+            return np.zeros([0], dtype=self.dtype)
+        return np.concatenate(self.output)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coalescing redraw scheduler for mouse-driven updates. Handlers post the
+latest state for a (kind, key) slot instead of acting on every event; a
+timer tick applies whatever is pending at most max_fps times a second and
+runs each redraw the handlers asked for once.
+
+version: 0.1.0
+"""
+
+from collections import OrderedDict
+
+
+class RedrawScheduler:
+    """
+    post(kind, key, state) replaces any pending state in the same slot, so
+    a burst of events for one slot costs one update. tick() calls the
+    handler connected for each pending kind as handler(key, state); a
+    handler may return a redraw callable, and each distinct callable runs
+    once after all pending updates are applied.
+
+    timer is anything with start(msec) and isActive(), e.g. a single-shot
+    QTimer whose timeout is connected to tick(). Without one, call tick()
+    or flush() directly.
+    """
+    def __init__(self, max_fps=60, timer=None):
+        self.interval = max(1, int(1000/max_fps))
+        self.timer = timer
+        self.handlers = {}
+        self.pending = OrderedDict()
+
+        # Counters; see stats()
+        self.posted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.applied = 0
+        self.ticks = 0
+
+    def connect(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def post(self, kind, key, state):
+        self.posted += 1
+        slot = (kind, key)
+        if slot in self.pending:
+            self.coalesced += 1
+        self.pending[slot] = state
+        if self.timer is not None and not self.timer.isActive():
+            self.timer.start(self.interval)
+
+    def drop(self, n=1):
+        """
+        Counts events a handler discarded without posting them.
+        """
+        self.dropped += n
+
+    def clear(self):
+        """
+        Discards everything pending.
+        """
+        self.dropped += len(self.pending)
+        self.pending.clear()
+
+    def tick(self):
+        self.ticks += 1
+        self.flush()
+
+    def flush(self):
+        """
+        Applies everything pending now, in the order the slots were first
+        posted.
+        """
+        redraws = OrderedDict()
+        while self.pending:
+            (kind, key), state = self.pending.popitem(last=False)
+            redraw = self.handlers[kind](key, state)
+            self.applied += 1
+            if redraw is not None:
+                redraws[redraw] = None
+        for redraw in redraws:
+            redraw()
+
+    def stats(self):
+        return {"posted": self.posted, "coalesced": self.coalesced,
+                "dropped": self.dropped, "applied": self.applied,
+                "ticks": self.ticks, "pending": len(self.pending)}
@@ -6,7 +6,10 @@ Created on Thu Jul  7 12:48:00 2016
 @author: daniel
 """
 
-print('Testing - controller.synth loaded successfully')
+import controller.synth.resonator
 import controller.synth.klatt
 import controller.synth.util
 import controller.synth.sine
+import controller.synth.stream
+import controller.synth.cache
+import controller.synth.incremental
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    name:    cache.py
+    version: 0.1.3
+    purpose: memoize synthesized waveforms by a fingerprint of everything
+             that determines them
+"""
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+# Parameters attributes that change the synthesized waveform
+FINGERPRINT_FIELDS = ("FF", "BW", "envelope", "F0", "voicing", "radiation",
+                      "inc_ms", "dur", "synth_fs", "synthesis_type")
+
+
+def fingerprint(parms):
+    """
+    Returns a hex digest identifying the waveform a model.Parameters
+    instance would synthesize. parms.FF must already hold the track matrix.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for field in FINGERPRINT_FIELDS:
+        value = getattr(parms, field)
+        digest.update(field.encode())
+        if isinstance(value, str):
+            digest.update(value.encode())
+        else:
+            value = np.ascontiguousarray(value, dtype=float)
+            digest.update(str(value.shape).encode())
+            digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+class SynthCache:
+    """
+    Least-recently-used store of synthesized waveforms, bounded by the total
+    number of bytes held. Cached arrays are made read-only since the same
+    array is handed out on every hit.
+    """
+    def __init__(self, max_bytes=256*2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        waveform = self.entries.get(key)
+        if waveform is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return waveform
+
+    def put(self, key, waveform):
+        if waveform.nbytes > self.max_bytes:
+            return
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key).nbytes
+        waveform.flags.writeable = False
+        self.entries[key] = waveform
+        self.nbytes += waveform.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    name:    incremental.py
+    version: 0.1.3
+    purpose: re-render only the part of a Klatt waveform that a track edit
+             actually changes
+"""
+
+import threading
+import numpy as np
+from controller.synth import stream
+
+
+# Parameters attributes that must match the last render for an incremental
+# update; anything else (tracks, bandwidths, envelope) may change
+FIXED_FIELDS = ("synthesis_type", "F0", "voicing", "radiation", "inc_ms",
+                "dur", "synth_fs")
+
+
+class Render:
+    """
+    A finished render: the parameters and engine that produced it, the
+    waveform, and the engine state at the start of every interval.
+    """
+    def __init__(self, parms, engine, waveform, checkpoints):
+        self.parms = parms
+        self.engine = engine
+        self.waveform = waveform
+        self.checkpoints = checkpoints
+
+
+class IncrementalKlatt:
+    """
+    Renders Klatt waveforms while keeping engine checkpoints every interval
+    samples. When only the per-segment parameters change (e.g. a track
+    vertex was dragged), rendering resumes from the last checkpoint before
+    the first changed segment and stops once the new output is back within
+    tolerance (relative to the peak) of the previous waveform, after the
+    last changed segment has been passed. Everything else is copied from the
+    previous render.
+    """
+    def __init__(self, interval=2048, tolerance=1e-6):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.last = None
+        self.lock = threading.Lock()
+        self.full_renders = 0
+        self.partial_renders = 0
+        self.rendered_samples = 0
+
+    def render(self, parms, report=None):
+        """
+        Returns the waveform for a Klatt model.Parameters instance. report,
+        if given, is called with the fraction of the waveform rendered so
+        far and may raise to abandon the render; nothing is kept then.
+        """
+        engine = stream.synthengine(parms)
+        with self.lock:
+            last = self.last
+
+        dirty = None
+        if last is not None and self.compatible(last, parms, engine):
+            dirty = self.dirtyrange(last.engine, engine)
+            if dirty is None:
+                return last.waveform
+
+        if dirty is None:
+            waveform = np.empty([engine.n_samples])
+            checkpoints = []
+            start, stop, previous = 0, engine.n_samples, None
+        else:
+            waveform = np.array(last.waveform)
+            checkpoints = list(last.checkpoints)
+            start = (dirty[0]//self.interval)*self.interval
+            stop, previous = dirty[1], last.waveform
+            engine.setstate(checkpoints[start//self.interval])
+        peak = 0.0 if previous is None else np.max(np.abs(previous))
+
+        while not engine.done:
+            index = engine.position//self.interval
+            if index < len(checkpoints):
+                checkpoints[index] = engine.getstate()
+            else:
+                checkpoints.append(engine.getstate())
+            block_start = engine.position
+            block = engine.render(self.interval)
+            waveform[block_start:engine.position] = block
+            if report is not None:
+                report(engine.position/engine.n_samples)
+            if previous is not None and engine.position >= stop:
+                difference = np.abs(block - previous[block_start:engine.position])
+                if np.all(difference <= self.tolerance*peak):
+                    break
+
+        with self.lock:
+            self.last = Render(parms, engine, waveform, checkpoints)
+            if previous is None:
+                self.full_renders += 1
+            else:
+                self.partial_renders += 1
+            self.rendered_samples = engine.position - start
+        return waveform
+
+    def compatible(self, last, parms, engine):
+        if parms.synthesis_type != "Klatt 1980":
+            return False
+        for field in FIXED_FIELDS:
+            if getattr(last.parms, field) != getattr(parms, field):
+                return False
+        return (np.array_equal(last.engine.bounds, engine.bounds) and
+                last.engine.A.shape == engine.A.shape)
+
+    def dirtyrange(self, old, new):
+        """
+        Returns the sample range covered by segments whose parameters differ
+        between two engines, or None if none do.
+        """
+        changed = ((old.A != new.A) | (old.B != new.B) | (old.C != new.C)).any(axis=1)
+        changed |= old.envelope != new.envelope
+        segments = np.flatnonzero(changed)
+        if segments.size == 0:
+            return None
+        return new.bounds[segments[0]], new.bounds[segments[-1]+1]
+
+    def clear(self):
+        with self.lock:
+            self.last = None
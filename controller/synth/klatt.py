@@ -6,200 +6,230 @@
     purpose: provide functions to perform vocal waveform synthesis ala Klatt 1980
 """
 
-def klattresonate(x, param, Fs):
-    
-    # Define imports
-    import math
-    import numpy as np
-    
-    # Necessary variables
-    dt = 1/Fs
-    n_samples = x.size
-    
-    # Create y[t] (output waveform)
-    y = np.zeros([n_samples])
+import numpy as np
+from controller import instrument
+from controller.synth import resonator
+from controller.synth import util
+
+def klattresonate(x, param, Fs, bounds=None):
+    """
+    param holds one frequency/bandwidth row per sample or, if bounds is
+    given, one row per segment x[bounds[k]:bounds[k+1]].
+    """
 
     # Decompose parameter matrix
     frequency = param[:,0]
     bandwidth = param[:,1]
 
     # Calculate coefficients
-    A = np.zeros([n_samples,1])
-    B = np.zeros([n_samples,1])
-    C = np.zeros([n_samples,1])
-    for i in range(0,n_samples):
-        C[i] = -math.exp(-2*math.pi*bandwidth[i]*dt)
-        B[i] = (2*math.exp(-math.pi*bandwidth[i]*dt)
-                *math.cos(2*math.pi*frequency[i]*dt))
-        A[i] = 1-B[i]-C[i]
-    
-    # Calculate first two samples
-    y[0] = A[0] * x[0]
-    y[1] = A[1] * x[1] - (-B[1])*y[0]
+    A, B, C = resonator.resonatorcoeffs(frequency, bandwidth, Fs)
     
     # Filter
-    for n in range(2,n_samples):
-        y[n] = (A[n] * x[n]) - ((-B[n]) * y[n-1]) - ((-C[n]) * y[n-2])
+    y, _ = resonator.twopole(x, A, B, C, bounds)
 
     return(y)
     
-def klattantiresonate(x, param, Fs):
-    
-    # Imports
-    import math
-    import numpy as np
-    
-    # Necessary variables
-    dt = 1/Fs
-    n_samples = x.size
-    
-    # Create y[t] (output waveform)
-    y = np.zeros([n_samples])
+def klattantiresonate(x, param, Fs, bounds=None):
 
     # Decompose parameter matrix
     frequency = param[:,0]
     bandwidth = param[:,1]
 
     # Calculate coefficients
-    A = np.zeros([n_samples,1])
-    B = np.zeros([n_samples,1])
-    C = np.zeros([n_samples,1])
-    A_prime = np.zeros([n_samples, 1])
-    B_prime = np.zeros([n_samples, 1])
-    C_prime = np.zeros([n_samples, 1])
-    for i in range(0,n_samples):
-        C[i] = -math.exp(-2*math.pi*bandwidth[i]*dt)
-        B[i] = (2*math.exp(-math.pi*bandwidth[i]*dt)
-                *math.cos(2*math.pi*frequency[i]*dt))
-        A[i] = 1-B[i]-C[i]
-        A_prime[i] = 1/A[i]
-        B_prime[i] = (-B[i])/A[i]
-        C_prime[i] = (-C[i])/A[i]
-    
-    # Calculate first two samples
-    y[0] = A_prime[0] * x[0]
-    y[1] = A_prime[1] * x[1] - (-B_prime[1])*y[0]
+    A_prime, B_prime, C_prime = resonator.antiresonatorcoeffs(frequency,
+                                                              bandwidth, Fs)
     
     # Filter
-    for n in range(2,n_samples):
-        y[n] = A_prime[n] * x[n] + B_prime[n] * y[n-1] + C_prime[n] * y[n-2]
+    y, _ = resonator.twopole(x, A_prime, B_prime, C_prime, bounds)
 
     return(y)
     
-def klattinterpolate(x, n_inc, inc_samples, n_samples):
+def klattcascade(x, formant_track, bandwidth_track, Fs, bounds=None):
+    """
+    Applies every formant resonator to x in a single pass. The tracks have
+    one column per formant and one row per sample or, if bounds is given,
+    per segment.
+    """
     
-    # Imports
-    from scipy.interpolate import interp1d
-    import numpy as np
+    # Calculate coefficients for all formants at once
+    A, B, C = resonator.resonatorcoeffs(formant_track, bandwidth_track, Fs)
     
-    # Perform interpolate to n_inc
-    n_input_steps = x.size
-    seq = np.arange(0,n_input_steps)
-    seq_new = np.linspace(0,n_input_steps-1,n_inc)
-    temp = interp1d(seq, x)(seq_new)
-    
-    # Map to step function
-    vector_out = np.zeros([n_samples,])
-    k = 0 # Counter
-    for i in range(0,n_samples):
-        if k == n_inc-1 or k == n_inc:
-            k = n_inc-1
-        elif i%inc_samples == 0:
-            k = k + 1
-        vector_out[i] = temp[int(k)]
+    # Filter
+    y, _ = resonator.cascade(x, A, B, C, bounds)
+
+    return(y)
+    
+def klattinterpolate(x, n_inc, inc_samples, n_samples):
+    
+    # Interpolate to frames and map to step function
+    frames = klattframes(x, n_inc)
+    bounds, frame_index = klattsegments(n_inc, inc_samples, n_samples)
+    vector_out = np.repeat(frames[frame_index], np.diff(bounds), axis=0)
 
     return(vector_out)
 
-def klattvoice(f0, n_samples, Fs, envelope):
+def klattframes(x, n_inc):
+    """
+    Linearly interpolates x to n_inc evenly spaced frames. x is a single
+    track or a matrix with one column per track; all columns are done at once.
+    """
     
-    # Imports
-    import numpy as np
+    # Perform interpolate to n_inc
+    frames = util.interpolate(x, n_inc)
     
-    # Generate constant impulse train
-    inc = round(Fs/f0)
-    voice = np.zeros([n_samples])
-    for i in range(0,n_samples):
-        if i%inc == 0:
-            voice[i] = 1
+    return(frames)
 
-    voice = voice*envelope
+def klattsegments(n_inc, inc_samples, n_samples):
+    """
+    Describes the step function klattinterpolate() maps frames onto: segment
+    k covers samples bounds[k]:bounds[k+1] and holds frame frame_index[k].
+    A new frame starts on every sample i with i%inc_samples == 0, beginning
+    with frame 1 on sample 0, and the last frame is held until the end.
+    """
     
-    # Generate resonator parameters and apply resonator
-    frequency = np.zeros([n_samples, 1])
-    bandwidth = np.ones([n_samples, 1]) * 100
-    voice = klattresonate(voice, np.concatenate((frequency, bandwidth),
-                                                axis = 1), Fs)
+    # Find the samples on which a new frame starts
+    n_candidates = np.ceil(n_samples/inc_samples)
+    candidates = np.round(np.arange(0, n_candidates)*inc_samples)
+    starts = candidates[(candidates < n_samples) &
+                        (candidates%inc_samples == 0)].astype(int)
+    frame_index = np.minimum(np.arange(1, starts.size+1), n_inc-1)
     
-    # Generate antiresonator parameters and apply antiresonator
-    frequency = np.ones([n_samples, 1]) * 1500
-    bandwidth = np.ones([n_samples, 1]) * 6000
-    voice = klattantiresonate(voice, np.concatenate((frequency, bandwidth),
-                                                    axis = 1), Fs)
+    # Merge segments that hold the same frame
+    keep = np.ones(starts.size, dtype=bool)
+    keep[1:] = frame_index[1:] != frame_index[:-1]
+    bounds = np.append(starts[keep], n_samples)
     
+    return(bounds, frame_index[keep])
+
+def klattimpulses(inc, envelope, start=0):
+    """
+    Impulse train scaled by the envelope, with an impulse on every sample i
+    (counted from start) with i%inc == 0. envelope may have a leading
+    stimulus axis, in which case inc is one spacing per stimulus or shared.
+    """
+    envelope = np.asarray(envelope, dtype=float)
+    voice = np.zeros(envelope.shape)
+    incs = np.broadcast_to(inc, envelope.shape[:-1])
+    for i in np.ndindex(incs.shape):
+        offset = (-start)%int(incs[i])
+        voice[i][offset::int(incs[i])] = envelope[i][offset::int(incs[i])]
     return(voice)
+
+def klattglottal(voice, Fs, state=None):
+    """
+    Shapes an impulse train into glottal pulses with the fixed resonator
+    and antiresonator, run as one two-section cascade. voice is one signal
+    or (n_stimuli, n_samples). state is the cascade state from a previous
+    call; returns the pulses and the new state.
+    """
     
-def klattnoise(n_samples, Fs, envelope):
-    
-    # Imports
-    import numpy as np
+    # Their parameters are constant, so the whole signal is one segment
+    A, B, C = resonator.resonatorcoeffs(0, 100, Fs)
+    A_prime, B_prime, C_prime = resonator.antiresonatorcoeffs(1500, 6000, Fs)
+    n_samples = voice.shape[-1]
+    if voice.ndim == 1:
+        return resonator.cascade(voice, [[A, A_prime]], [[B, B_prime]],
+                                 [[C, C_prime]], [0, n_samples], state)
+    shape = (1, voice.shape[0], 2)
+    return resonator.cascadebatch(voice, np.broadcast_to([A, A_prime], shape),
+                                  np.broadcast_to([B, B_prime], shape),
+                                  np.broadcast_to([C, C_prime], shape),
+                                  [0, n_samples], state)
+
+def klattnoisesource(rng, envelope, carry=None):
+    """
+    Noise source scaled by the envelope, which may have a leading stimulus
+    axis. Every sample is the mean of 16 uniform draws, neighbouring
+    samples share 8 of them, and a 6 dB/oct filter follows. carry is what a
+    previous call returned to continue from, the sum of the last 8 draws
+    and the last noise sample; returns the noise and the new carry.
+    """
+    envelope = np.asarray(envelope, dtype=float)
+    shape, n_samples = envelope.shape[:-1], envelope.shape[-1]
     
     # Generate noise
-    noise_big = np.random.uniform(low = 0.0, high = 1.0, size = n_samples*16)
-    noise = np.zeros([n_samples])
-    
-    # Reduce noise
-    for i in range(n_samples):
-        temp = np.zeros([16])
-        for j in range(16):
-            temp[j] = noise_big[i*8+j]
-        noise[i] = np.mean(temp)
-        
-    noise = noise*envelope   
-        
+    if carry is None:
+        noise_big = rng.uniform(low = 0.0, high = 1.0,
+                                size = shape + ((n_samples+1)*8,))
+        blocks = noise_big.reshape(shape + (n_samples+1, 8)).sum(axis=-1)
+        last = np.zeros(shape)
+    else:
+        first, last = carry
+        noise_big = rng.uniform(low = 0.0, high = 1.0,
+                                size = shape + (n_samples*8,))
+        blocks = noise_big.reshape(shape + (n_samples, 8)).sum(axis=-1)
+        blocks = np.concatenate((np.reshape(first, shape + (1,)), blocks),
+                                axis=-1)
+    noise = (blocks[..., :-1] + blocks[..., 1:])/16
+    noise = noise*envelope
+    
     # Apply 6 dB/oct filter
-    noise_out = np.zeros([n_samples])
-    noise_out[0] = (1/2)*noise[0]
-    for i in range(1, n_samples, 1):
-        noise_out[i] = (1/2)*(noise[i] + noise[i-1])
+    noise_out = (1/2)*noise
+    noise_out[..., 1:] += (1/2)*noise[..., :-1]
+    if n_samples == 0:
+        return noise_out, (blocks[..., -1], last)
+    noise_out[..., 0] += (1/2)*last
+    
+    return(noise_out, (blocks[..., -1], noise[..., -1]))
 
-    return(noise)
+def klattvoice(f0, n_samples, Fs, envelope, dtype=float):
+    
+    # Generate constant impulse train, scaled by the envelope, and shape
+    # it into glottal pulses
+    envelope = np.broadcast_to(envelope, (n_samples,))
+    voice = klattimpulses(round(Fs/f0), envelope)
+    voice, _ = klattglottal(voice, Fs)
+    
+    return(voice.astype(dtype, copy=False))
     
-def klattsynthesize(formant_track, bandwidth_track, f0, voicing, dur, n_samples, Fs, radiation, envelope):
+def klattnoise(n_samples, Fs, envelope, rng=None, dtype=float):
+    """
+    rng is a numpy Generator or anything np.random.default_rng() accepts,
+    e.g. an integer seed for reproducible noise.
+    """
     
-    # Imports
-    import numpy as np
+    envelope = np.broadcast_to(envelope, (n_samples,))
+    noise_out, _ = klattnoisesource(np.random.default_rng(rng), envelope)
+
+    return(noise_out.astype(dtype, copy=False))
+    
+def klattsynthesize(formant_track, bandwidth_track, f0, voicing, dur, n_samples, Fs, radiation, envelope, bounds=None, rng=None):
+    """
+    The tracks and envelope hold one row per sample or, if bounds is given,
+    one row per segment of constant parameters (see klattsegments()).
+    """
     
     # Create necessary variables
-    n_formants = formant_track.shape[1]
+    if bounds is not None:
+        envelope = np.repeat(envelope, np.diff(bounds))
 
     # Generate voicing waveform
-    if voicing == 1:
-        voice = klattvoice(f0, n_samples, Fs, envelope)
-    elif voicing == 0:
-        voice = klattnoise(n_samples, Fs, envelope)
+    with instrument.stage("klatt.source", n_samples):
+        if voicing == 1:
+            voice = klattvoice(f0, n_samples, Fs, envelope)
+        elif voicing == 0:
+            voice = klattnoise(n_samples, Fs, envelope, rng)
         
     # Apply filter cascade
-    for i in range(0,n_formants):
-        voice = klattresonate(voice, np.column_stack((formant_track[:,i],
-                                                      bandwidth_track[:,i])), 
-                                                        Fs)
+    with instrument.stage("klatt.cascade", n_samples):
+        voice = klattcascade(voice, formant_track, bandwidth_track, Fs,
+                             bounds)
+    
     if radiation == 1: 
         # Apply radiation characteristic
-        voice_out = np.zeros([n_samples])
-        voice_out[0] = voice[0]
-        for i in range(1, n_samples):
-            voice_out[i] = (voice[i] - voice[i-1])   
-        return(voice_out)
-    else:
-        return(voice)
+        with instrument.stage("klatt.radiation", n_samples):
+            voice = np.diff(voice, prepend=0)
 
-def klattmake(input_formants, input_bandwidths, input_envelope, f0, voicing, inc_ms, dur, Fs, radiation):
+    return(voice)
 
-    # Import
-    import numpy as np
+def klattparameters(input_formants, input_bandwidths, input_envelope, inc_ms, dur, Fs):
+    """
+    Turns the input tracks into segments of constant parameters. Returns
+    n_samples, the segment bounds and one formant, bandwidth and envelope
+    row per segment.
+    """
     
     # Create necessary variables
-    n_formants = input_formants.shape[1]
     n_samples = round(dur*Fs)
     inc_seconds = inc_ms*0.001
     inc_samples = inc_seconds*Fs
@@ -208,17 +238,78 @@ def klattmake(input_formants, input_bandwidths, input_envelope, f0, voicing, inc
     else:
         n_inc = dur/inc_seconds
 
+    n_inc = int(round(n_inc))
+
+    # Interpolate inputs to one row per frame
+    formant_frames = klattframes(input_formants, n_inc)
+    bandwidth_frames = klattframes(input_bandwidths, n_inc)
+    envelope_frames = klattframes(input_envelope, n_inc)
+    
+    # Map frames onto segments of constant parameters
+    bounds, frame_index = klattsegments(n_inc, inc_samples, n_samples)
+    
+    return(n_samples, bounds, formant_frames[frame_index],
+           bandwidth_frames[frame_index], envelope_frames[frame_index])
+
+def klattmake(input_formants, input_bandwidths, input_envelope, f0, voicing, inc_ms, dur, Fs, radiation, rng=None):
+    
     # Interpolate inputs
-    interpolated_formants = np.zeros([n_samples, n_formants])
-    interpolated_bandwidths = np.zeros([n_samples, n_formants])
-    interpolated_envelope = np.zeros([n_samples])
-    for i in range(0,n_formants):
-        interpolated_formants[:,i] = klattinterpolate(input_formants[:,i], n_inc, inc_samples, n_samples)
-        interpolated_bandwidths[:,i] = klattinterpolate(input_bandwidths[:,i], n_inc, inc_samples, n_samples)
-        interpolated_envelope = klattinterpolate(input_envelope, n_inc, inc_samples, n_samples)
+    with instrument.stage("klatt.interpolate") as stage:
+        n_samples, bounds, formant_track, bandwidth_track, envelope = \
+            klattparameters(input_formants, input_bandwidths, input_envelope,
+                            inc_ms, dur, Fs)
+        stage.samples = n_samples
     
     # Synthesize
-    vowel = klattsynthesize(interpolated_formants, interpolated_bandwidths, f0,
-                            voicing, dur, n_samples, Fs, radiation, interpolated_envelope)
+    vowel = klattsynthesize(formant_track, bandwidth_track, f0, voicing, dur,
+                            n_samples, Fs, radiation, envelope, bounds, rng)
     
     return(vowel)
+
+def klattbatch(input_formants, input_bandwidths, input_envelope, f0, voicing, inc_ms, dur, Fs, radiation, rng=None):
+    """
+    Synthesizes a set of stimuli in one pass, e.g. a continuum that varies
+    F2 or F0. input_formants is stacked as (n_stimuli, n_points, n_formants);
+    input_bandwidths, input_envelope and f0 are either shared by all
+    stimuli or stacked the same way. Returns (n_stimuli, n_samples).
+    """
+    
+    # Broadcast shared inputs to one per stimulus
+    input_formants = np.asarray(input_formants, dtype=float)
+    n_stimuli = input_formants.shape[0]
+    input_bandwidths = np.asarray(input_bandwidths, dtype=float)
+    input_bandwidths = np.broadcast_to(input_bandwidths,
+                                       (n_stimuli,) + input_bandwidths.shape[-2:])
+    input_envelope = np.asarray(input_envelope, dtype=float)
+    input_envelope = np.broadcast_to(input_envelope,
+                                     (n_stimuli, input_envelope.shape[-1]))
+    f0 = np.broadcast_to(f0, (n_stimuli,))
+    
+    # Interpolate inputs; the points axis goes first, stimuli second
+    with instrument.stage("klatt.interpolate") as stage:
+        n_samples, bounds, formant_track, bandwidth_track, envelope = \
+            klattparameters(np.moveaxis(input_formants, 0, 1),
+                            np.moveaxis(input_bandwidths, 0, 1),
+                            np.moveaxis(input_envelope, 0, 1), inc_ms, dur, Fs)
+        envelope = np.repeat(envelope, np.diff(bounds), axis=0).T
+        stage.samples = n_stimuli*n_samples
+    
+    # Generate voicing waveforms
+    with instrument.stage("klatt.source", n_stimuli*n_samples):
+        if voicing == 1:
+            incs = [round(Fs/f) for f in f0]
+            voice, _ = klattglottal(klattimpulses(incs, envelope), Fs)
+        elif voicing == 0:
+            voice, _ = klattnoisesource(np.random.default_rng(rng), envelope)
+    
+    # Apply filter cascade
+    with instrument.stage("klatt.cascade", n_stimuli*n_samples):
+        A, B, C = resonator.resonatorcoeffs(formant_track, bandwidth_track, Fs)
+        voice, _ = resonator.cascadebatch(voice, A, B, C, bounds)
+    
+    if radiation == 1:
+        # Apply radiation characteristic
+        with instrument.stage("klatt.radiation", n_stimuli*n_samples):
+            voice = np.diff(voice, axis=1, prepend=0)
+    
+    return(voice)
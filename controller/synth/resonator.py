@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    name:    resonator.py
+    version: 0.1.3
+    purpose: provide interchangeable kernels for the time-varying two-pole
+             recursion shared by the Klatt resonators and antiresonators
+"""
+
+import importlib.util
+import numpy as np
+from controller.synth import util
+
+# Both are imported on first use: scipy.signal by the lfilter kernel and
+# numba when its kernels are first compiled, see _resolve()
+signal = util.lazyimport("scipy.signal")
+numba = util.lazyimport("numba")
+has_numba = importlib.util.find_spec("numba") is not None
+
+
+# Names accepted by setbackend(). "auto" picks numba when it is installed and
+# falls back to lfilter otherwise; "python" is the reference implementation.
+BACKENDS = ("auto", "python", "lfilter", "numba")
+backend = "auto"
+
+
+def setbackend(name):
+    """
+    Selects the kernel used by twopole() and cascade() from now on.
+    """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError("Unknown resonator backend: " + str(name))
+    if name == "numba" and not has_numba:
+        raise ValueError("The numba resonator backend requires numba")
+    backend = name
+
+
+def resonatorcoeffs(frequency, bandwidth, Fs):
+    """
+    Returns the A, B, C coefficients of a Klatt (1980) resonator for every
+    entry of the frequency and bandwidth arrays.
+    """
+    dt = 1/Fs
+    frequency = np.asarray(frequency, dtype=float)
+    bandwidth = np.asarray(bandwidth, dtype=float)
+    C = -np.exp(-2*np.pi*bandwidth*dt)
+    B = 2*np.exp(-np.pi*bandwidth*dt)*np.cos(2*np.pi*frequency*dt)
+    A = 1-B-C
+    return A, B, C
+
+
+def antiresonatorcoeffs(frequency, bandwidth, Fs):
+    """
+    Returns the coefficients used by klattantiresonate(), expressed so that
+    the antiresonator runs through the same recursion as the resonator.
+    """
+    A, B, C = resonatorcoeffs(frequency, bandwidth, Fs)
+    return 1/A, -B/A, -C/A
+
+
+def twopole(x, A, B, C, bounds=None, state=None, backend=None):
+    """
+    Filters x with y[n] = A*x[n] + B*y[n-1] + C*y[n-2].
+
+    The coefficients are either given per sample (bounds is None) or per
+    segment, in which case segment k covers x[bounds[k]:bounds[k+1]] and
+    uses A[k], B[k], C[k]. state holds [y[n-1], y[n-2]] from a previous call
+    (zeros by default), so a long signal can be filtered in pieces.
+
+    Returns the filtered signal and the state at the end of x.
+    """
+    A = np.asarray(A, dtype=float).reshape(-1, 1)
+    B = np.asarray(B, dtype=float).reshape(-1, 1)
+    C = np.asarray(C, dtype=float).reshape(-1, 1)
+    if state is not None:
+        state = np.asarray(state, dtype=float).reshape(1, 2)
+    y, state = cascade(x, A, B, C, bounds, state, backend)
+    return y, state[0]
+
+
+def cascade(x, A, B, C, bounds=None, state=None, backend=None):
+    """
+    Runs x through a chain of two-pole sections in a single pass. A, B and C
+    have one column per section and, like twopole(), one row per sample or
+    per segment of bounds. state has one [y[n-1], y[n-2]] row per section.
+
+    Returns the output of the last section and the state of every section.
+    """
+    x = np.asarray(x, dtype=float)
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    C = np.asarray(C, dtype=float)
+    if bounds is None:
+        bounds, A, B, C = _runs(A, B, C)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if state is None:
+        state = np.zeros([A.shape[1], 2])
+    else:
+        state = np.array(state, dtype=float)
+
+    kernel = _KERNELS[_resolve(backend)]
+    y = kernel(x, A, B, C, bounds, state)
+    return y, state
+
+
+def cascadebatch(x, A, B, C, bounds, state=None, backend=None):
+    """
+    cascade() for many signals at once. x is (n_signals, n_samples) and A,
+    B, C are (n_segments, n_signals, n_sections): every signal has its own
+    coefficients but all share the segment bounds. state is
+    (n_signals, n_sections, 2).
+
+    With numba the compiled kernel runs over each signal in turn; otherwise
+    the recursion steps through the samples once, vectorized across the
+    signals ("python" keeps a pure-Python reference loop).
+    """
+    x = np.asarray(x, dtype=float)
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    C = np.asarray(C, dtype=float)
+    bounds = np.asarray(bounds, dtype=np.int64)
+    if state is None:
+        state = np.zeros([x.shape[0], A.shape[2], 2])
+    else:
+        state = np.array(state, dtype=float)
+
+    kernel = _BATCH_KERNELS[_resolve(backend)]
+    y = kernel(x, np.ascontiguousarray(A), np.ascontiguousarray(B),
+               np.ascontiguousarray(C), bounds, state)
+    return y, state
+
+
+def _resolve(name):
+    if name is None:
+        name = backend
+    if name == "auto":
+        name = "numba" if has_numba else "lfilter"
+    if name == "numba" and "numba" not in _KERNELS and has_numba:
+        _KERNELS["numba"] = numba.njit(cache=True)(_cascadepython)
+        _BATCH_KERNELS["numba"] = numba.njit(cache=True)(_cascadebatchpython)
+    if name not in _KERNELS:
+        raise ValueError("Unknown resonator backend: " + str(name))
+    return name
+
+
+def _runs(A, B, C):
+    """
+    Collapses per-sample coefficients into runs of constant coefficients.
+    """
+    n_samples = A.shape[0]
+    if n_samples == 0:
+        return np.zeros(1, dtype=np.int64), A, B, C
+    changed = (A[1:] != A[:-1]) | (B[1:] != B[:-1]) | (C[1:] != C[:-1])
+    changes = np.flatnonzero(changed.reshape(n_samples-1, -1).any(axis=1)) + 1
+    starts = np.concatenate(([0], changes))
+    bounds = np.concatenate((starts, [n_samples]))
+    return bounds, A[starts], B[starts], C[starts]
+
+
+def _cascadepython(x, A, B, C, bounds, state):
+    y = np.empty(x.shape[0])
+    n_sections = A.shape[1]
+    for k in range(bounds.shape[0]-1):
+        for n in range(bounds[k], bounds[k+1]):
+            out = x[n]
+            for j in range(n_sections):
+                out = A[k, j]*out + B[k, j]*state[j, 0] + C[k, j]*state[j, 1]
+                state[j, 1] = state[j, 0]
+                state[j, 0] = out
+            y[n] = out
+    return y
+
+
+def _cascadelfilter(x, A, B, C, bounds, state):
+    y = np.empty(x.shape[0])
+    sos = np.zeros([A.shape[1], 6])
+    sos[:, 3] = 1
+    for k in range(bounds.shape[0]-1):
+        start, stop = bounds[k], bounds[k+1]
+        if stop <= start:
+            continue
+        sos[:, 0] = A[k]
+        sos[:, 4] = -B[k]
+        sos[:, 5] = -C[k]
+        # The transposed direct form state is rebuilt from the output history
+        # so that each segment may use different coefficients
+        zi = np.column_stack((B[k]*state[:, 0] + C[k]*state[:, 1],
+                              C[k]*state[:, 0]))
+        y[start:stop], zf = signal.sosfilt(sos, x[start:stop], zi=zi)
+        y1 = zf[:, 1]/C[k]
+        state[:, 1] = (zf[:, 0] - B[k]*y1)/C[k]
+        state[:, 0] = y1
+    return y
+
+
+def _cascadebatchpython(x, A, B, C, bounds, state):
+    y = np.empty(x.shape)
+    n_sections = A.shape[2]
+    for i in range(x.shape[0]):
+        for k in range(bounds.shape[0]-1):
+            for n in range(bounds[k], bounds[k+1]):
+                out = x[i, n]
+                for j in range(n_sections):
+                    out = (A[k, i, j]*out + B[k, i, j]*state[i, j, 0] +
+                           C[k, i, j]*state[i, j, 1])
+                    state[i, j, 1] = state[i, j, 0]
+                    state[i, j, 0] = out
+                y[i, n] = out
+    return y
+
+
+def _cascadebatchnumpy(x, A, B, C, bounds, state):
+    # Work sample-major so every step touches contiguous rows, and keep one
+    # array per section so the state shifts are reference swaps
+    x = np.ascontiguousarray(x.T)
+    y = np.empty(x.shape)
+    n_sections = A.shape[2]
+    y1 = [state[:, j, 0].copy() for j in range(n_sections)]
+    y2 = [state[:, j, 1].copy() for j in range(n_sections)]
+    for k in range(bounds.shape[0]-1):
+        a = [A[k, :, j].copy() for j in range(n_sections)]
+        b = [B[k, :, j].copy() for j in range(n_sections)]
+        c = [C[k, :, j].copy() for j in range(n_sections)]
+        for n in range(bounds[k], bounds[k+1]):
+            out = x[n]
+            for j in range(n_sections):
+                out = a[j]*out + b[j]*y1[j] + c[j]*y2[j]
+                y2[j] = y1[j]
+                y1[j] = out
+            y[n] = out
+    for j in range(n_sections):
+        state[:, j, 0] = y1[j]
+        state[:, j, 1] = y2[j]
+    return y.T
+
+
+_KERNELS = {"python": _cascadepython, "lfilter": _cascadelfilter}
+_BATCH_KERNELS = {"python": _cascadebatchpython,
+                  "lfilter": _cascadebatchnumpy}
@@ -5,38 +5,57 @@
 temporary sine wave synthesis algorithm for 07/19 lab meeting demo
 """
 
-def sinemake(input_formants, input_envelope, dur, Fs):
-    # Import
-    import numpy as np
-    from scipy.interpolate import interp1d
-    import matplotlib.pyplot as plt
-    
+import numpy as np
+from controller.synth import util
+
+
+def sinemake(input_formants, input_envelope, dur, Fs, amplitudes=None, block_size=65536):
+    """
+    Sums one cosine oscillator per column of input_formants, for any number
+    of formants. amplitudes optionally weights the oscillators, either with
+    one value per formant or with a track matrix interpolated like the
+    formants. The waveform is built block_size samples at a time, so the
+    samples x formants intermediates stay bounded for long durations.
+    """
     # Create necessary variables
-    dt = 1/Fs
     n_formants = input_formants.shape[1]
     n_samples = round(dur*Fs)
-    t = np.arange(0, dur, dt)
+    output_wave = np.zeros([n_samples])
+    phase = np.zeros([n_formants])
     
-    # Interpolate "formants"
-    interpolated_formants = np.zeros([n_samples, n_formants])
-    for i in range(n_formants):
-        seq = np.arange(0, input_formants.shape[0])
-        seq_new = np.linspace(0, input_formants.shape[0]-1, n_samples)
-        temp = interp1d(seq, input_formants[:,i])(seq_new)
-        interpolated_formants[:,i] = temp
-
-    # Interpolate envelope
-    seq = np.arange(0, input_envelope.shape[0])
-    seq_new = np.linspace(0, input_envelope.shape[0]-1, n_samples)
-    interpolated_envelope = interp1d(seq, input_envelope)(seq_new)
+    for start in range(0, n_samples, block_size):
+        stop = min(start+block_size, n_samples)
+        output_wave[start:stop], phase = sineblock(input_formants,
+                                                   input_envelope, n_samples,
+                                                   Fs, start, stop, phase,
+                                                   amplitudes)
     
-    # Generate sine waves
-    waves = []
-    for i in range(n_formants):
-        phase = np.cumsum(2*np.pi*interpolated_formants[:,i]/Fs)
-        waves.append(np.cos(phase))
-    output_wave = np.zeros([n_samples])
-    output_wave = waves[0]+waves[1]+waves[2]+waves[3]+waves[4]
-    output_wave = output_wave*interpolated_envelope
     return(output_wave)
-        
\ No newline at end of file
+
+def sineblock(input_formants, input_envelope, n_samples, Fs, start, stop, phase, amplitudes=None):
+    """
+    Computes samples start:stop of a sinemake() waveform that is n_samples
+    long. phase holds each oscillator's phase at sample start; the phases at
+    sample stop are returned with the block.
+    """
+    # Interpolate "formants" and envelope
+    formants = util.interpolate(input_formants, n_samples, start, stop)
+    envelope = util.interpolate(input_envelope, n_samples, start, stop)
+    
+    # Accumulate phase, continuing from the end of the previous block
+    increments = np.empty([stop-start+1, len(phase)])
+    increments[0] = phase
+    increments[1:] = 2*np.pi*formants/Fs
+    phases = np.cumsum(increments, axis=0)[1:]
+    
+    # Generate sine waves and sum them
+    waves = np.cos(phases)
+    if amplitudes is None:
+        block = waves.sum(axis=1)
+    elif np.ndim(amplitudes) == 1:
+        block = waves @ np.asarray(amplitudes, dtype=float)
+    else:
+        weights = util.interpolate(amplitudes, n_samples, start, stop)
+        block = (waves*weights).sum(axis=1)
+    
+    return(block*envelope, phases[-1])
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    name:    stream.py
+    version: 0.1.3
+    purpose: render the Klatt and sine wave synthesizers block by block,
+             carrying filter and oscillator state between blocks
+"""
+
+import numpy as np
+from controller import instrument
+from controller.synth import klatt, resonator, sine
+
+
+class KlattStream:
+    """
+    Produces the same waveform as klatt.klattmake(), a block at a time.
+    Only the per-segment parameters and the filter state are kept between
+    calls to render(), so memory does not grow with the duration.
+    """
+    def __init__(self, input_formants, input_bandwidths, input_envelope, f0,
+                 voicing, inc_ms, dur, Fs, radiation, rng=None):
+        self.n_samples, self.bounds, self.formants, self.bandwidths,\
+            self.envelope = klatt.klattparameters(input_formants,
+                                                  input_bandwidths,
+                                                  input_envelope,
+                                                  inc_ms, dur, Fs)
+        self.voicing = voicing
+        self.radiation = radiation
+        self.position = 0
+
+        # Formant cascade coefficients, one row per segment
+        self.A, self.B, self.C = resonator.resonatorcoeffs(self.formants,
+                                                           self.bandwidths,
+                                                           Fs)
+
+        # Voicing source: impulse spacing; noise source: the generator
+        # and what klatt.klattnoisesource() carries between blocks
+        self.Fs = Fs
+        self.inc = round(Fs/f0)
+        self.rng = np.random.default_rng(rng)
+        self.noise_carry = None
+
+        # Filter state
+        self.source_state = np.zeros([2, 2])
+        self.cascade_state = np.zeros([self.A.shape[1], 2])
+        self.radiation_last = 0.0
+
+    @property
+    def done(self):
+        return self.position >= self.n_samples
+
+    def getstate(self):
+        """
+        Returns a snapshot of everything render() carries between blocks.
+        Restoring it with setstate(), on this engine or on another one with
+        the same segment bounds, resumes rendering from the same sample.
+        """
+        return {"position": self.position,
+                "source_state": self.source_state.copy(),
+                "cascade_state": self.cascade_state.copy(),
+                "radiation_last": self.radiation_last,
+                "noise_carry": self.noise_carry,
+                "rng": self.rng.bit_generator.state}
+
+    def setstate(self, state):
+        self.position = state["position"]
+        self.source_state = state["source_state"].copy()
+        self.cascade_state = state["cascade_state"].copy()
+        self.radiation_last = state["radiation_last"]
+        self.noise_carry = state["noise_carry"]
+        self.rng.bit_generator.state = state["rng"]
+
+    def render(self, n):
+        """
+        Returns the next n samples (fewer at the end of the waveform).
+        """
+        start = self.position
+        stop = min(start+n, self.n_samples)
+        self.position = stop
+
+        # Segments overlapping this block, with bounds relative to it
+        first = np.searchsorted(self.bounds, start, side="right") - 1
+        last = np.searchsorted(self.bounds, stop, side="left")
+        segments = slice(max(first, 0), max(last, 0))
+        bounds = np.clip(self.bounds[segments.start:segments.stop+1],
+                         start, stop) - start
+        envelope = np.repeat(self.envelope[segments], np.diff(bounds))
+
+        # Source
+        with instrument.stage("klatt.source", stop-start):
+            voice = self.source(start, stop, envelope)
+
+        # Formant cascade
+        with instrument.stage("klatt.cascade", stop-start):
+            voice, self.cascade_state = resonator.cascade(
+                voice, self.A[segments], self.B[segments], self.C[segments],
+                bounds, self.cascade_state)
+
+        # Radiation characteristic
+        if self.radiation == 1 and stop > start:
+            with instrument.stage("klatt.radiation", stop-start):
+                last = voice[-1]
+                voice = np.diff(voice, prepend=self.radiation_last)
+                self.radiation_last = last
+
+        return voice
+
+    def source(self, start, stop, envelope):
+        """
+        Voicing or noise source for samples start:stop.
+        """
+        if self.voicing == 1:
+            voice = klatt.klattimpulses(self.inc, envelope, start)
+            voice, self.source_state = klatt.klattglottal(voice, self.Fs,
+                                                          self.source_state)
+            return voice
+        voice, self.noise_carry = klatt.klattnoisesource(self.rng, envelope,
+                                                         self.noise_carry)
+        return voice
+
+
+class SineStream:
+    """
+    Produces the same waveform as sine.sinemake(), a block at a time.
+    """
+    def __init__(self, input_formants, input_envelope, dur, Fs,
+                 amplitudes=None):
+        self.input_formants = input_formants
+        self.input_envelope = input_envelope
+        self.amplitudes = amplitudes
+        self.Fs = Fs
+        self.n_samples = round(dur*Fs)
+        self.position = 0
+        self.phase = np.zeros([input_formants.shape[1]])
+
+    @property
+    def done(self):
+        return self.position >= self.n_samples
+
+    def render(self, n):
+        """
+        Returns the next n samples (fewer at the end of the waveform).
+        """
+        start = self.position
+        stop = min(start+n, self.n_samples)
+        self.position = stop
+        block, self.phase = sine.sineblock(self.input_formants,
+                                           self.input_envelope,
+                                           self.n_samples, self.Fs,
+                                           start, stop, self.phase,
+                                           self.amplitudes)
+        return block
+
+
+def blocks(engine, block_size=4096):
+    """
+    Yields successive blocks of block_size samples from a KlattStream or
+    SineStream until the waveform is complete.
+    """
+    while not engine.done:
+        yield engine.render(block_size)
+
+
+def klattstream(input_formants, input_bandwidths, input_envelope, f0, voicing,
+                inc_ms, dur, Fs, radiation, rng=None, block_size=4096):
+    """
+    Generator version of klatt.klattmake().
+    """
+    return blocks(KlattStream(input_formants, input_bandwidths,
+                              input_envelope, f0, voicing, inc_ms, dur, Fs,
+                              radiation, rng), block_size)
+
+
+def sinestream(input_formants, input_envelope, dur, Fs, amplitudes=None,
+               block_size=4096):
+    """
+    Generator version of sine.sinemake().
+    """
+    return blocks(SineStream(input_formants, input_envelope, dur, Fs,
+                             amplitudes), block_size)
+
+
+def synthengine(parms, rng=None):
+    """
+    Builds the engine for the synthesizer selected by a model.Parameters
+    instance, the same way Controller.synth() picks between klattmake() and
+    sinemake().
+    """
+    if parms.synthesis_type == "Klatt 1980":
+        return KlattStream(parms.FF, parms.BW, parms.envelope, parms.F0,
+                           parms.voicing, parms.inc_ms, parms.dur,
+                           parms.synth_fs, parms.radiation, rng)
+    elif parms.synthesis_type == "Sine Wave":
+        return SineStream(parms.FF, parms.envelope, parms.dur,
+                          parms.synth_fs)
+    raise ValueError("Unknown synthesis type: " + str(parms.synthesis_type))
+
+
+def synthstream(parms, block_size=4096):
+    """
+    Streams the synthesizer selected by a model.Parameters instance.
+    """
+    return blocks(synthengine(parms), block_size)
+
+
+def peakestimate(engine, n_probes=32, probe_len=1024, headroom=None):
+    """
+    Estimates the peak of everything a fresh engine renders, e.g. to scale
+    streamed playback before the waveform exists. Sine waves are bounded
+    by the oscillator amplitudes times the envelope's peak. For Klatt, the
+    source is run through the cascade of n_probes segments (spread over the
+    sound, plus the loudest) for probe_len samples each, all as one batch;
+    the largest probe peak times its envelope value, plus headroom for
+    transients between segments, is the estimate. headroom defaults to
+    1.25 for voicing and 1.5 for noise, whose peaks the probes sample less
+    reliably.
+    """
+    if isinstance(engine, SineStream):
+        if engine.amplitudes is None:
+            amplitude = engine.input_formants.shape[1]
+        else:
+            amplitudes = np.abs(np.atleast_2d(engine.amplitudes))
+            amplitude = amplitudes.max(axis=0).sum()
+        return amplitude*np.max(np.abs(engine.input_envelope))
+
+    envelope = np.abs(engine.envelope)
+    probes = np.linspace(0, len(envelope)-1, n_probes).round().astype(int)
+    probes = np.unique(np.append(probes, np.argmax(envelope)))
+    probes = probes[envelope[probes] > 0]
+    if len(probes) == 0:
+        return 0.0
+
+    # Source at unit envelope, the same for every probe
+    ones = np.ones([len(probes), probe_len])
+    if engine.voicing == 1:
+        voice, _ = klatt.klattglottal(klatt.klattimpulses(engine.inc, ones),
+                                      engine.Fs)
+    else:
+        voice, _ = klatt.klattnoisesource(np.random.default_rng(0), ones)
+    voice, _ = resonator.cascadebatch(voice, engine.A[None, probes],
+                                      engine.B[None, probes],
+                                      engine.C[None, probes], [0, probe_len])
+    if engine.radiation == 1:
+        voice = np.diff(voice, axis=1, prepend=0)
+    if headroom is None:
+        headroom = 1.25 if engine.voicing == 1 else 1.5
+    peaks = np.max(np.abs(voice), axis=1)*envelope[probes]
+    return headroom*peaks.max()
+
+
+def render(engine, block_size=16384, report=None):
+    """
+    Renders everything an engine has left into one array. report, if given,
+    is called with the fraction completed after every block.
+    """
+    output = np.empty([engine.n_samples - engine.position])
+    offset = engine.position
+    while not engine.done:
+        start = engine.position - offset
+        block = engine.render(block_size)
+        output[start:start+len(block)] = block
+        if report is not None:
+            report(engine.position/engine.n_samples)
+    return output
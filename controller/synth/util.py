@@ -8,11 +8,37 @@
     purpose: provide various utility functions for TrackDraw 2016
 """
 
+import sys
+import importlib
+import numpy as np
+
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access, so
+    heavy dependencies (scipy.signal, ...) only cost start-up time for code
+    that actually uses them.
+    """
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attr):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attr)
+
+
+def lazyimport(name):
+    """
+    Returns the module if it is already imported, otherwise a LazyModule.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
 def specEnv(spectrum, f0, Fs):
     
-    # Imports
-    import numpy as np
-    
     # Generate cepstrum
     cepstrum = np.fft.ifft(20*np.log10(abs(spectrum)))
     index = round(Fs/f0)
@@ -25,4 +51,28 @@ def specEnv(spectrum, f0, Fs):
             cepstrum[i] = 0
     envelope = np.fft.fft(cepstrum)
     return(envelope)
-        
\ No newline at end of file
+        
+def interpolate(x, n_out, start=0, stop=None):
+    """
+    Linearly interpolates x, a track or a matrix with one column per track,
+    onto n_out evenly spaced points (interp1d evaluated on np.linspace).
+    Only points start:stop are computed, so long outputs can be built in
+    blocks.
+    """
+    
+    # Positions of the requested points along the input
+    x = np.asarray(x, dtype=float)
+    n_in = x.shape[0]
+    if stop is None:
+        stop = n_out
+    step = (n_in-1)/(n_out-1) if n_out > 1 else 0
+    positions = np.arange(start, stop)*step
+    if stop == n_out and n_out > 1 and stop > start:
+        positions[-1] = n_in-1
+    
+    # Locate each point between two input points
+    lower = np.minimum(positions.astype(int), max(n_in-2, 0))
+    upper = np.minimum(lower+1, n_in-1)
+    weight = (positions-lower).reshape((stop-start,) + (1,)*(x.ndim-1))
+    
+    return(x[lower] + (x[upper]-x[lower])*weight)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background jobs for the controller. Synthesis, spectrogram computation and
+file loading run on a thread pool so the Qt event loop never waits on them. Results are
+handed to plain callbacks; the controller routes those through Qt signals,
+and without Qt they can be consumed directly (see Worker.wait()).
+
+version: 0.1.0
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import model
+from controller import instrument, loader
+from controller.synth import stream
+
+
+class Cancelled(Exception):
+    """
+    Raised inside a job by Job.report() once the job has gone stale.
+    """
+    pass
+
+
+class Job:
+    """
+    Handle for one submitted job. Job functions receive it as their first
+    argument and should call report() regularly; that is where progress is
+    published and where a cancelled job stops.
+    """
+    def __init__(self, worker, kind):
+        self.worker = worker
+        self.kind = kind
+        self.cancelled = False
+        self.future = None
+        # Free for the submitter, e.g. to remember what the result is for
+        self.tag = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, fraction):
+        if self.cancelled:
+            raise Cancelled
+        self.worker.progress(self, fraction)
+
+
+class Worker:
+    """
+    Runs at most one live job per kind ("synth", "plot", ...). Submitting a
+    job cancels the previous job of the same kind, and a cancelled job never
+    reaches the finished/failed callbacks.
+
+    finished(job, result), progress(job, fraction) and failed(job, error)
+    are called from the pool thread.
+    """
+    def __init__(self, finished=None, progress=None, failed=None,
+                 max_workers=2):
+        self.finished = finished or (lambda job, result: None)
+        self.progress = progress or (lambda job, fraction: None)
+        self.failed = failed or (lambda job, error: None)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = {}
+        self.lock = threading.RLock()
+
+    def submit(self, kind, fn, *args):
+        """
+        Schedules fn(job, *args) and returns its Job.
+        """
+        with self.lock:
+            self.cancel(kind)
+            job = Job(self, kind)
+            self.jobs[kind] = job
+            job.future = self.executor.submit(self.run, job, fn, args)
+        return job
+
+    def current(self, kind):
+        """
+        Returns the job of the given kind if it is still queued or running.
+        """
+        with self.lock:
+            job = self.jobs.get(kind)
+        if job is None or job.future.done():
+            return None
+        return job
+
+    def cancel(self, kind):
+        with self.lock:
+            job = self.jobs.pop(kind, None)
+        if job is not None:
+            job.cancel()
+
+    def run(self, job, fn, args):
+        try:
+            result = fn(job, *args)
+        except Cancelled:
+            return
+        except Exception as error:
+            if not job.cancelled:
+                self.failed(job, error)
+            return
+        if not job.cancelled:
+            self.finished(job, result)
+
+    def wait(self, kind):
+        """
+        Blocks until the current job of the given kind is done.
+        """
+        job = self.jobs.get(kind)
+        if job is not None and not job.future.cancelled():
+            job.future.result()
+
+    def shutdown(self):
+        for kind in list(self.jobs):
+            self.cancel(kind)
+        self.executor.shutdown(wait=True)
+
+
+def synthesize(job, parms, block_size=16384, incremental=None):
+    """
+    Job function: renders the synthesizer selected by parms block by block,
+    reporting progress after each block. Klatt renders go through
+    incremental (an IncrementalKlatt) when one is given.
+    """
+    with instrument.stage("synth.render") as stage:
+        if incremental is not None and parms.synthesis_type == "Klatt 1980":
+            waveform = incremental.render(parms, job.report)
+        else:
+            engine = stream.synthengine(parms)
+            waveform = stream.render(engine, block_size, job.report)
+        stage.samples = len(waveform)
+    return waveform
+
+
+def spectrogram(job, model, key, waveform, scale, view):
+    """
+    Job function: returns what the model's spectrogram for a
+    spectrogramKey() shows over view, a (t0, t1, n_columns) tuple,
+    computing whatever is not cached yet. waveform and scale are a Sound's
+    data and scale.
+    """
+    job.report(0)
+    with instrument.stage("plot.spectrogram", len(waveform)):
+        spec = model.getSpectrogram(key, waveform, scale=scale)
+        return spec.view(*view)
+
+
+def load(job, path, fs, storage=None, scratch=None):
+    """
+    Job function: reads a WAV file as a mono waveform at fs, chunk by
+    chunk, reporting progress after each chunk. Returns a model.Sound in
+    the given storage with its overview already built, so all the O(n)
+    work stays off the GUI thread; see Sound.adopt().
+    """
+    waveform, fs = loader.loadwav(path, fs, report=job.report)
+    with instrument.stage("load.store", len(waveform)):
+        sound = model.Sound(waveform, fs, 1, storage, scratch)
+        del waveform
+        sound.overview
+    return sound
@@ -8,6 +8,10 @@ date:    07/17/2016
 version: 0.1.0
 """
 
+import math
+import tempfile
+import threading
+from collections import OrderedDict
 import numpy as np
 
 
@@ -16,9 +20,12 @@ class Model:
     Contains:
         default_parms - Default parameters
         current_parms - Current parameters; expect this to change at runtime
-        tracks - Container for the Track class instances
+        track_points - Track data, one row of track_npoints per track
+        tracks - Track views onto the rows of track_points
         loaded_sound - Sound object for holding the loaded sound file
         synth_sound  - Sound object for holding the synthesized sound
+        spectrograms - Cache of Spectrogram/SpectrogramPyramid objects, see
+                       getSpectrogram()
     """
     def __init__(self):
         self.default_parms = Parameters()
@@ -27,62 +34,613 @@ class Model:
         # Create the default formant tracks
         default_FFs = self.default_parms.FF
         track_npoints = self.default_parms.track_npoints
-        ones = np.ones(track_npoints)
-        self.tracks = [Track(formant*ones) for formant in default_FFs]
+        self.track_points = np.ones([len(default_FFs), track_npoints])*\
+                            np.reshape(default_FFs, (-1, 1))
+        self.tracks = [Track(points) for points in self.track_points]
+        self.hit_tester = TrackHitTester(39, self.track_points.shape)
 
         # Define the two sounds: load and synth
         resample_fs = self.default_parms.resample_fs
         synth_fs = self.default_parms.synth_fs
-        self.loaded_sound = Sound(np.array([]), resample_fs, 1)
-        self.synth_sound  = Sound(np.array([]), synth_fs, 1)
+        self.loaded_sound = Sound(np.array([]), resample_fs, 1, "int16")
+        self.synth_sound  = Sound(np.array([]), synth_fs, 1, "float32")
+
+        # Recently computed spectrograms, see getSpectrogram()
+        self.spectrograms = OrderedDict()
+        self.max_spectrogram_bytes = 256*2**20
+        # Longer sounds get a SpectrogramPyramid instead
+        self.max_spectrogram_frames = 16384
+        self.spectrogram_lock = threading.Lock()
         
+    def hitTester(self, x_high):
+        """
+        Returns the TrackHitTester for the current tracks drawn over
+        0..x_high, building a new one only when either has changed.
+        """
+        if not self.hit_tester.fits(x_high, self.track_points):
+            self.hit_tester = TrackHitTester(x_high, self.track_points.shape)
+        return self.hit_tester
+
+    def nearestVertex(self, x_loc, x_high):
+        return self.hitTester(x_high).vertex(x_loc)
+
     def updateTrackClick(self, x_loc, y_loc, x_high):
-        dist_to_x_pts = np.abs(np.arange(0,x_high,x_high/40) - x_loc)
-        nearest_x_idx = dist_to_x_pts.argmin()
-        y_coords_at_nearest_x = np.array(\
-                [track.points[nearest_x_idx] for track in self.tracks])
-        dist_to_y_pts = np.abs(y_coords_at_nearest_x - y_loc)
-        trackNo = dist_to_y_pts.argmin()
-        self.tracks[trackNo].points[nearest_x_idx] = y_loc
+        hit_tester = self.hitTester(x_high)
+        nearest_x_idx = hit_tester.vertex(x_loc)
+        trackNo = hit_tester.track(self.track_points, nearest_x_idx, y_loc)
+        self.track_points[trackNo, nearest_x_idx] = y_loc
         return trackNo, self.tracks[trackNo].points
         
     def updateTrackDrag(self, x_loc, y_loc, trackNo, x_high):
-        dist_to_x_pts = np.abs(np.arange(0,x_high,x_high/40) - x_loc)
-        nearest_x_idx = dist_to_x_pts.argmin()
-        self.tracks[trackNo].points[nearest_x_idx] = y_loc
+        nearest_x_idx = self.nearestVertex(x_loc, x_high)
+        return self.updateTrackVertex(trackNo, nearest_x_idx, y_loc)
+
+    def updateTrackVertex(self, trackNo, vertex, y_loc):
+        self.track_points[trackNo, vertex] = y_loc
         return trackNo, self.tracks[trackNo].points
 
     def getTracks(self):
-        output = np.zeros([40, len(self.tracks)])
-        for i in range(len(self.tracks)):
-            output[0:40, i] = self.tracks[i].points
-        return(output)
+        """
+        Returns the tracks as synthesis expects them, one row per point and
+        one column per track. This is a view of track_points, not a copy;
+        snapshot it before handing it to another thread.
+        """
+        return self.track_points.T
+
+    def setTrackNpoints(self, track_npoints):
+        """
+        Resamples every track to track_npoints points spanning the same
+        time, and rebuilds the Track views.
+        """
+        old_npoints = self.track_points.shape[1]
+        old_x = np.arange(old_npoints)/old_npoints
+        new_x = np.arange(track_npoints)/track_npoints
+        self.track_points = np.array([np.interp(new_x, old_x, points)
+                                      for points in self.track_points])
+        self.tracks = [Track(points) for points in self.track_points]
+        self.current_parms.track_npoints = track_npoints
+
+    def spectrogramKey(self, sound, window_len):
+        """
+        Identifies the spectrogram of sound's current waveform. Take the key
+        and the waveform together, on the thread that assigns waveforms.
+        """
+        noverlap = int(0.75*window_len)
+        return (id(sound), sound.version, window_len, noverlap, sound.fs)
+
+    def getSpectrogram(self, key, waveform, compute=True, scale=1.0):
+        """
+        Returns the Spectrogram for a spectrogramKey(), computing and
+        caching it unless compute is False (then None is returned on a
+        miss). Sounds with more than max_spectrogram_frames frames get a
+        SpectrogramPyramid, whose tiles are computed on demand by view().
+        waveform may be a Sound's stored data with its scale. Safe to call
+        from worker threads.
+
+        Inserting a spectrogram drops those of older versions of the same
+        sound, which are never shown again. The rest are evicted least
+        recently used once their nbytes add up to more than
+        max_spectrogram_bytes; a pyramid's tiles count as they are now, so
+        the one in use may grow past that by its own max_bytes.
+        """
+        with self.spectrogram_lock:
+            spec = self.spectrograms.get(key)
+            if spec is not None:
+                self.spectrograms.move_to_end(key)
+                return spec
+        if not compute:
+            return None
+        _, _, window_len, noverlap, fs = key
+        n_frames = (max(len(waveform), window_len) - window_len)\
+                   //(window_len - noverlap) + 1
+        if n_frames > self.max_spectrogram_frames:
+            spec = SpectrogramPyramid(waveform, window_len, noverlap, fs,
+                                      scale)
+        else:
+            spec = Spectrogram(waveform, window_len, noverlap, fs, scale)
+        sound_id, version = key[:2]
+        with self.spectrogram_lock:
+            for old in [old for old in self.spectrograms
+                        if old[0] == sound_id and old[1] < version]:
+                del self.spectrograms[old]
+            self.spectrograms[key] = spec
+            nbytes = sum(cached.nbytes for cached in self.spectrograms.values())
+            while nbytes > self.max_spectrogram_bytes and\
+                  len(self.spectrograms) > 1:
+                _, evicted = self.spectrograms.popitem(last=False)
+                nbytes -= evicted.nbytes
+        return spec
 
 class Sound:
     """
     The Sound class now automatically updates n_samples whenever the waveform
     attribute changes. n_samples should never be changed individually.
     - Cho, 07/16
+
+    storage picks how assigned waveforms are kept: None keeps the array as
+    given, "float32" converts, and "int16" stores round(waveform/scale)
+    with scale chosen so the peak maps to 32767. If scratch is a
+    directory, the stored samples live in a memory-mapped temporary file
+    there instead of in RAM. data and scale give the stored samples
+    without copying; samples() converts a range and waveform converts the
+    whole sound, only when asked for.
     """
-    def __init__(self, waveform, fs, nchannels):
+    def __init__(self, waveform, fs, nchannels, storage=None, scratch=None):
+        self.storage = storage
+        self.scratch = scratch
         self.waveform = waveform
         self.fs = fs
         self.nchannels = nchannels
 
     @property
     def waveform(self):
-        return self._waveform
+        return self.samples()
     # Automatically update n_samples and t whenever waveform changes
     @waveform.setter
     def waveform(self, val):
-        self._waveform = val
-        self.nsamples = len(self._waveform)
+        self._data, self.scale = self.store(val)
+        self.nsamples = len(self._data)
+        # Lets caches tell waveforms apart; see Model.spectrogramKey()
+        self.version = getattr(self, "version", 0) + 1
+        self._overview = None
+        self._spectra = None
+
+    def adopt(self, other):
+        """
+        Takes over another Sound's stored samples and sample rate, as if
+        its waveform had been assigned here; e.g. one built on a worker
+        thread. Its overview comes along if it was built already.
+        """
+        self._data, self.scale = other._data, other.scale
+        self.nsamples = other.nsamples
+        self.fs = other.fs
+        self.version += 1
+        self._overview = other._overview
+        self._spectra = None
+
+    @property
+    def data(self):
+        """
+        The stored samples; multiply by scale for the waveform.
+        """
+        return self._data
+
+    def samples(self, start=0, stop=None, dtype=None):
+        """
+        Returns a range of the waveform as floats, converted from storage
+        if needed. dtype defaults to the stored one for float storage and
+        float32 otherwise.
+        """
+        chunk = self._data[start:stop]
+        if dtype is None:
+            dtype = chunk.dtype if np.issubdtype(chunk.dtype, np.floating)\
+                    else np.float32
+        if chunk.dtype == dtype and self.scale == 1.0:
+            return chunk
+        return np.multiply(chunk, self.scale, dtype=dtype)
+
+    def store(self, val, chunk_size=2**20):
+        """
+        Converts an assigned waveform to the storage format, a chunk at a
+        time. Returns the stored array and its scale factor.
+        """
+        val = np.asarray(val)
+        if self.storage is None and self.scratch is None:
+            return val, 1.0
+        dtype = np.dtype(self.storage or val.dtype)
+        scale = 1.0
+        if dtype == np.int16 and val.dtype != np.int16:
+            peak = max(val.max(), -val.min()) if len(val) else 0
+            scale = float(peak)/32767 if peak > 0 else 1.0
+        elif self.scratch is None and val.dtype == dtype:
+            return val, scale
+
+        if self.scratch is None:
+            data = np.empty(val.shape, dtype=dtype)
+        else:
+            scratch_file = tempfile.TemporaryFile(dir=self.scratch)
+            data = np.memmap(scratch_file, dtype=dtype, mode="w+",
+                             shape=val.shape) if len(val) else\
+                   np.empty(val.shape, dtype=dtype)
+        for start in range(0, len(val), chunk_size):
+            chunk = val[start:start+chunk_size]
+            if dtype == np.int16 and val.dtype != np.int16:
+                chunk = np.round(chunk/scale)
+            data[start:start+chunk_size] = chunk
+        return data, scale
+
+    @property
+    def overview(self):
+        """
+        WaveformOverview of the waveform, built on first use.
+        """
+        if self._overview is None:
+            self._overview = WaveformOverview(self._data, self.scale)
+        return self._overview
+
+    @property
+    def spectra(self):
+        """
+        FrameSpectra of the waveform, normalized to its peak.
+        """
+        if self._spectra is None:
+            peak = max(self.overview.high, -self.overview.low)
+            self._spectra = FrameSpectra(self._data, peak/self.scale)
+        return self._spectra
+
+
+class FrameSpectra:
+    """
+    Magnitude spectra in dB of Hann-windowed frames of frame_len samples,
+    one frame centred every hop samples, for showing the spectrum under the
+    pointer. The waveform is scaled to a peak of 1 (and the window's gain
+    undone) without copying it. Spectra are computed when first asked for
+    and the most recent max_frames are kept.
+    """
+    def __init__(self, waveform, peak, frame_len=256, hop=32,
+                 max_frames=4096):
+        self.waveform = waveform
+        self.frame_len = frame_len
+        self.hop = hop
+        self.max_frames = max_frames
+        self.window = np.hanning(frame_len)*2/(peak if peak > 0 else 1)
+        self.frame = np.zeros([frame_len])
+        self.spectra = OrderedDict()
+
+    def spectrum(self, sample):
+        """
+        Returns the spectrum of the frame centred nearest to sample.
+        """
+        index = int(round(sample/self.hop))
+        Z = self.spectra.get(index)
+        if Z is not None:
+            self.spectra.move_to_end(index)
+            return Z
+
+        # Frames running off either end are zero-padded
+        start = index*self.hop - self.frame_len//2
+        first = max(start, 0)
+        last = min(start + self.frame_len, len(self.waveform))
+        self.frame[:] = 0
+        if last > first:
+            self.frame[first-start:last-start] = self.waveform[first:last]
+        self.frame *= self.window
+        magnitude = np.abs(np.fft.rfft(self.frame))
+        Z = (20*np.log10(np.maximum(magnitude, 1e-10))).astype(np.float32)
+
+        self.spectra[index] = Z
+        if len(self.spectra) > self.max_frames:
+            self.spectra.popitem(last=False)
+        return Z
+
+
+class WaveformOverview:
+    """
+    Min/max envelopes of a waveform for drawing it at any zoom. Level k
+    holds the minimum and maximum of every base*2**k samples as float32;
+    all levels together take an eighth of the memory of a float64
+    waveform with the default base. envelope() draws from the level giving
+    at most about 2 points per pixel column. waveform may be stored
+    samples, with scale converting them to the waveform.
+    """
+    def __init__(self, waveform, scale=1.0, base=16, min_bins=256):
+        self.waveform = waveform
+        self.scale = scale
+        self.base = base
+        self.levels = []
+
+        # First level straight from the samples; the tail is its own bin
+        x = np.asarray(waveform)
+        n_full = len(x)//base*base
+        blocks = x[:n_full].reshape(-1, base)
+        mins = blocks.min(axis=1).astype(np.float32)
+        maxs = blocks.max(axis=1).astype(np.float32)
+        if n_full < len(x):
+            mins = np.append(mins, np.float32(x[n_full:].min()))
+            maxs = np.append(maxs, np.float32(x[n_full:].max()))
+        self.levels.append((mins, maxs))
+
+        # Each further level halves the one below
+        while len(mins) > min_bins:
+            n_pairs = len(mins)//2
+            mins_up = mins[:2*n_pairs].reshape(-1, 2).min(axis=1)
+            maxs_up = maxs[:2*n_pairs].reshape(-1, 2).max(axis=1)
+            if 2*n_pairs < len(mins):
+                mins_up = np.append(mins_up, mins[-1])
+                maxs_up = np.append(maxs_up, maxs[-1])
+            mins, maxs = mins_up, maxs_up
+            self.levels.append((mins, maxs))
+
+        self.low = float(mins.min())*scale if len(mins) else 0.0
+        self.high = float(maxs.max())*scale if len(maxs) else 0.0
+
+    def envelope(self, start, stop, n_columns):
+        """
+        Returns sample positions and values tracing the waveform from sample
+        start to stop across n_columns pixel columns. Spans short enough are
+        returned sample by sample, longer ones as alternating bin minima and
+        maxima.
+        """
+        start = max(0, int(start))
+        stop = min(len(self.waveform), int(np.ceil(stop)))
+        span = max(stop - start, 0)
+        if span <= 2*n_columns:
+            return (np.arange(start, stop),
+                    np.multiply(self.waveform[start:stop], self.scale))
+
+        bin_len = span/n_columns
+        if bin_len < self.base:
+            # Below the first level: reduce the visible samples directly
+            bin_len = int(np.ceil(bin_len))
+            first = start//bin_len
+            edges = np.arange(first*bin_len, stop, bin_len)
+            x = np.asarray(self.waveform)
+            mins = np.minimum.reduceat(x[edges[0]:stop], edges - edges[0])
+            maxs = np.maximum.reduceat(x[edges[0]:stop], edges - edges[0])
+        else:
+            level = min(int(np.ceil(np.log2(bin_len/self.base))),
+                        len(self.levels) - 1)
+            bin_len = self.base << level
+            first = start//bin_len
+            last = -(-stop//bin_len)
+            mins, maxs = self.levels[level]
+            mins = mins[first:last]
+            maxs = maxs[first:last]
+            edges = np.arange(first, first + len(mins))*bin_len
+
+        positions = np.empty([2*len(edges)])
+        positions[0::2] = edges
+        positions[1::2] = edges + bin_len/2
+        values = np.empty([2*len(edges)])
+        values[0::2] = mins
+        values[1::2] = maxs
+        values *= self.scale
+        return positions, values
+
+
+class Spectrogram:
+    """
+    Short-time power spectrum of a waveform in dB, computed the way
+    matplotlib's specgram() does (Hann window, one-sided PSD), so it can be
+    drawn with imshow(origin="lower", extent=extent). Z has one row per
+    frequency and one column per frame.
+    """
+    def __init__(self, waveform, window_len, noverlap, fs, scale=1.0):
+        x = padWaveform(waveform, window_len)
+        step = window_len - noverlap
+        frames = np.lib.stride_tricks.sliding_window_view(x, window_len)[::step]
+        n_frames = frames.shape[0]
+
+        self.Z = powerSpectra(frames, fs, scale)
+        self.freqs = np.fft.rfftfreq(window_len, 1/fs)
+        self.t = (np.arange(n_frames)*step + window_len/2)/fs
+        pad = step/fs/2
+        self.extent = (self.t[0] - pad, self.t[-1] + pad,
+                       self.freqs[0], self.freqs[-1])
+
+    @property
+    def nbytes(self):
+        return self.Z.nbytes
+
+    def view(self, t0, t1, n_columns, compute=True):
+        """
+        A full spectrogram is shown whole at any zoom.
+        """
+        return self
+
+
+class SpectrogramView:
+    """
+    The part of a SpectrogramPyramid shown for one view; drawn the same way
+    as a Spectrogram.
+    """
+    def __init__(self, Z, freqs, extent):
+        self.Z = Z
+        self.freqs = freqs
+        self.extent = extent
+
+
+class SpectrogramPyramid:
+    """
+    Spectrogram of a long waveform, computed lazily in tiles of tile_len
+    columns. Level 0 has the frame step of a Spectrogram with the same
+    window; each level up doubles the step, so level L needs 2**L times
+    fewer transforms to cover the same time span. view() picks the level
+    giving about one column per pixel and computes only the tiles it
+    needs. Tiles are kept least-recently-used up to max_bytes.
+    """
+    def __init__(self, waveform, window_len, noverlap, fs, scale=1.0,
+                 tile_len=256, max_bytes=64*2**20):
+        self.waveform = waveform
+        self.scale = scale
+        self.window_len = window_len
+        self.step = window_len - noverlap
+        self.fs = fs
+        self.tile_len = tile_len
+        self.max_bytes = max_bytes
+        self.freqs = np.fft.rfftfreq(window_len, 1/fs)
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.shown = (None, None)
+
+    def columns(self, level):
+        """
+        Number of columns at a level.
+        """
+        hop = self.step << level
+        n_samples = max(len(self.waveform), self.window_len)
+        return (n_samples - self.window_len)//hop + 1
+
+    def level(self, t0, t1, n_columns):
+        """
+        Coarsest level that still has at least n_columns columns between
+        t0 and t1 (in seconds).
+        """
+        n_frames = (t1 - t0)*self.fs/self.step
+        if n_frames <= n_columns:
+            return 0
+        level = int(np.floor(np.log2(n_frames/n_columns)))
+        while level > 0 and self.columns(level) < 2:
+            level -= 1
+        return level
+
+    def tile(self, level, index, compute=True):
+        """
+        Returns the dB magnitudes of one tile, one row per frequency. Unless
+        compute is True, a tile that is not cached gives None.
+        """
+        key = (level, index)
+        with self.lock:
+            Z = self.tiles.get(key)
+            if Z is not None:
+                self.tiles.move_to_end(key)
+                return Z
+        if not compute:
+            return None
+        x = padWaveform(self.waveform, self.window_len)
+        hop = self.step << level
+        first = index*self.tile_len
+        last = min(first + self.tile_len, self.columns(level))
+        frames = np.lib.stride_tricks.sliding_window_view(x, self.window_len)
+        Z = powerSpectra(frames[first*hop:(last-1)*hop+1:hop], self.fs,
+                         self.scale)
+        with self.lock:
+            if key not in self.tiles:
+                self.tiles[key] = Z
+                self.nbytes += Z.nbytes
+            while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+                _, evicted = self.tiles.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return Z
+
+    def view(self, t0, t1, n_columns, compute=True):
+        """
+        Returns a SpectrogramView covering t0 to t1 (in seconds) with about
+        n_columns columns, or None if compute is False and a tile it needs
+        is not cached. Asking for the same columns again returns the same
+        object.
+        """
+        level = self.level(t0, t1, n_columns)
+        hop = self.step << level
+        n = self.columns(level)
+        offset = self.window_len/2
+        first = min(max(0, int((t0*self.fs - offset)//hop)), n - 1)
+        last = int(np.ceil((t1*self.fs - offset)/hop)) + 1
+        last = min(n, max(first + 1, last))
+        key, shown = self.shown
+        if key == (level, first, last):
+            return shown
+
+        first_tile = first//self.tile_len
+        last_tile = (last - 1)//self.tile_len
+        tiles = []
+        for index in range(first_tile, last_tile + 1):
+            Z = self.tile(level, index, compute)
+            if Z is None:
+                return None
+            tiles.append(Z)
+        start = first - first_tile*self.tile_len
+        Z = np.concatenate(tiles, axis=1)[:, start:start + last - first]
+
+        pad = hop/2
+        extent = ((first*hop + offset - pad)/self.fs,
+                  ((last - 1)*hop + offset + pad)/self.fs,
+                  self.freqs[0], self.freqs[-1])
+        shown = SpectrogramView(Z, self.freqs, extent)
+        self.shown = ((level, first, last), shown)
+        return shown
+
+    def stats(self):
+        return {"tiles": len(self.tiles), "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+def padWaveform(waveform, window_len):
+    """
+    Zero-pads a waveform shorter than one window to window_len samples, as
+    specgram() does, so that it still gives one frame.
+    """
+    x = np.asarray(waveform)
+    if len(x) < window_len:
+        x = np.concatenate((x, np.zeros([window_len - len(x)], dtype=x.dtype)))
+    return x
+
+
+def powerSpectra(frames, fs, gain=1.0, chunk=4096):
+    """
+    One-sided PSD in dB of each row of frames (times gain) under a Hann
+    window, as float32 with one row per frequency and one column per frame.
+    """
+    n_frames, window_len = frames.shape
+    window = np.hanning(window_len)
+
+    # Transform a chunk of frames at a time to bound temporary memory
+    Z = np.empty([window_len//2 + 1, n_frames], dtype=np.float32)
+    scale = 1/(fs*(window**2).sum())
+    window = window*gain
+    doubled = slice(1, -1) if window_len%2 == 0 else slice(1, None)
+    for start in range(0, n_frames, chunk):
+        spectra = np.fft.rfft(frames[start:start+chunk]*window, axis=1)
+        power = spectra.real**2 + spectra.imag**2
+        power[:, doubled] *= 2
+        Z[:, start:start+chunk] = (10*np.log10(power*scale)).T
+    return Z
+
+
+class TrackHitTester:
+    """
+    Maps pointer positions onto the vertices of tracks with track_npoints
+    points drawn evenly over 0..x_high. The vertex under x is found by
+    arithmetic on the grid spacing and the nearest track by one vectorized
+    pass over a column, into a preallocated buffer, so hit-testing costs
+    the same for dense tracks and allocates nothing per event.
+    """
+    def __init__(self, x_high, shape):
+        n_tracks, track_npoints = shape
+        self.x_high = x_high
+        self.shape = shape
+        self.spacing = x_high/track_npoints
+        self.last = track_npoints - 1
+        self.distances = np.empty([n_tracks])
+
+    def fits(self, x_high, track_points):
+        return x_high == self.x_high and track_points.shape == self.shape
+
+    def vertex(self, x_loc):
+        """
+        Index of the grid point nearest x_loc. The grid points around
+        x_loc/spacing are compared by the same float distances as argmin()
+        over the whole grid, so the result matches it exactly, with ties
+        going to the lower index.
+        """
+        guess = math.floor(x_loc/self.spacing)
+        best, best_distance = None, math.inf
+        for index in range(guess - 1, guess + 2):
+            index = min(max(index, 0), self.last)
+            distance = abs(index*self.spacing - x_loc)
+            if distance < best_distance:
+                best, best_distance = index, distance
+        return best
+
+    def track(self, track_points, vertex, y_loc):
+        """
+        Index of the track whose point at vertex is nearest y_loc.
+        """
+        np.subtract(track_points[:, vertex], y_loc, out=self.distances)
+        np.abs(self.distances, out=self.distances)
+        return self.distances.argmin()
 
 
 class Track:
     """
-    Helpful docstring
+    One formant track. points is a row of Model.track_points, so edits
+    through either show up in both.
     """
+    __slots__ = ("points",)
+
     def __init__(self, points):
         self.points = points
 
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures.
+
+version: 0.1.0
+"""
+
+import pytest
+from controller.synth import resonator
+
+
+@pytest.fixture(params=["python", "lfilter",
+                        pytest.param("numba", marks=pytest.mark.skipif(
+                            not resonator.has_numba,
+                            reason="numba is not installed"))])
+def backend(request, monkeypatch):
+    """
+    Runs a test once per resonator backend, selected for its duration.
+    """
+    monkeypatch.setattr(resonator, "backend", request.param)
+    return request.param
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+klattbatch() must match klattmake() run on each stimulus of the batch.
+
+version: 0.1.0
+"""
+
+import numpy as np
+import pytest
+from controller.synth import klatt
+
+
+FS = 10000
+DUR = 0.5
+N_STIMULI = 4
+
+
+def continuum(n_points=40):
+    """
+    An F2 continuum, stacked as (n_stimuli, n_points, n_formants).
+    """
+    formants = np.ones([N_STIMULI, n_points, 1])*np.array([500, 1500, 2500,
+                                                           3300, 3700])
+    formants[:, :, 1] = np.linspace(1100, 1900, N_STIMULI)[:, None]
+    return formants
+
+
+@pytest.mark.parametrize("radiation", [0, 1])
+@pytest.mark.parametrize("stacked", [False, True])
+def test_klattbatch(backend, radiation, stacked):
+    formants = continuum()
+    bandwidths = np.array([[50, 100, 100, 200, 250],
+                           [60, 120, 100, 200, 250]], dtype=float)
+    envelope = np.array([0, 1, 1, 1, 0])
+    f0 = np.array([90, 100, 110, 120])
+    if stacked:
+        bandwidths = bandwidths*np.linspace(1, 2, N_STIMULI)[:, None, None]
+        envelope = envelope*np.linspace(0.5, 1, N_STIMULI)[:, None]
+
+    y = klatt.klattbatch(formants, bandwidths, envelope, f0, 1, 5, DUR, FS,
+                         radiation)
+    assert y.shape == (N_STIMULI, round(DUR*FS))
+    for i in range(N_STIMULI):
+        reference = klatt.klattmake(formants[i],
+                                    bandwidths[i] if stacked else bandwidths,
+                                    envelope[i] if stacked else envelope,
+                                    f0[i], 1, 5, DUR, FS, radiation)
+        if backend == "lfilter":
+            # The batch recursion runs in numpy, klattmake through sosfilt
+            scale = np.max(np.abs(reference))
+            np.testing.assert_allclose(y[i], reference, rtol=0,
+                                       atol=1e-10*scale)
+        else:
+            np.testing.assert_array_equal(y[i], reference)
+
+
+def test_klattbatch_noise():
+    # One stimulus draws the same noise as klattmake with the same seed
+    formants = continuum()[:1]
+    bandwidths = np.array([[50, 100, 100, 200, 250]], dtype=float)
+    envelope = np.array([0, 1, 1, 1, 0])
+    y = klatt.klattbatch(formants, bandwidths, envelope, 100, 0, 5, DUR, FS,
+                         1, rng=7)
+    reference = klatt.klattmake(formants[0], bandwidths, envelope, 100, 0, 5,
+                                DUR, FS, 1, rng=7)
+    np.testing.assert_allclose(y[0], reference, rtol=0,
+                               atol=1e-10*np.max(np.abs(reference)))
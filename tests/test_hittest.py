@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TrackHitTester finds the same vertex and track as the per-track distance
+search it replaced.
+
+version: 0.1.0
+"""
+
+import numpy as np
+import pytest
+import model
+
+
+def reference_vertex(track_points, x_loc, x_high):
+    track_npoints = track_points.shape[1]
+    x_pts = np.arange(track_npoints)*(x_high/track_npoints)
+    return np.abs(x_pts - x_loc).argmin()
+
+
+def reference_track(track_points, vertex, y_loc):
+    return np.abs(track_points[:, vertex] - y_loc).argmin()
+
+
+@pytest.mark.parametrize("x_high", [39, 1.0, 2.37])
+@pytest.mark.parametrize("track_npoints", [40, 7, 200])
+def test_matches_distance_search(x_high, track_npoints):
+    m = model.Model()
+    m.setTrackNpoints(track_npoints)
+    rng = np.random.default_rng(0)
+    m.track_points += rng.uniform(-300, 300, m.track_points.shape)
+    spacing = x_high/track_npoints
+
+    # Random positions, outside the grid too, and the midpoints between
+    # grid points, where ties must go to the lower index
+    xs = np.concatenate((rng.uniform(-0.1*x_high, 1.1*x_high, 500),
+                         (np.arange(track_npoints) + 0.5)*spacing))
+    ys = rng.uniform(0, 5000, len(xs))
+    for x_loc, y_loc in zip(xs, ys):
+        vertex = m.nearestVertex(x_loc, x_high)
+        assert vertex == reference_vertex(m.track_points, x_loc, x_high)
+        tester = m.hitTester(x_high)
+        assert tester.track(m.track_points, vertex, y_loc) ==\
+               reference_track(m.track_points, vertex, y_loc)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IncrementalKlatt re-renders only what an edit changes and still matches a
+full klattmake() render.
+
+version: 0.1.0
+"""
+
+import copy
+import numpy as np
+import model
+from controller.synth import incremental, klatt, stream
+
+
+def parameters():
+    parms = model.Parameters(dur=2)
+    parms.FF = np.ones([40, 1])*np.array(parms.FF, dtype=float)
+    parms.BW = np.array(parms.BW, dtype=float)
+    return parms
+
+
+def klattmake(parms):
+    return klatt.klattmake(parms.FF, parms.BW, parms.envelope, parms.F0,
+                           parms.voicing, parms.inc_ms, parms.dur,
+                           parms.synth_fs, parms.radiation)
+
+
+def assert_within_tolerance(renderer, y, reference):
+    peak = np.max(np.abs(reference))
+    assert np.max(np.abs(y - reference)) <= renderer.tolerance*peak
+
+
+def test_vertex_edit_renders_part():
+    renderer = incremental.IncrementalKlatt()
+    parms = parameters()
+    renderer.render(parms)
+    assert renderer.full_renders == 1
+    n_samples = round(parms.dur*parms.synth_fs)
+
+    edited = copy.deepcopy(parms)
+    edited.FF[20, 1] += 200
+    y = renderer.render(edited)
+    assert renderer.partial_renders == 1
+    assert 0 < renderer.rendered_samples < n_samples/2
+    assert_within_tolerance(renderer, y, klattmake(edited))
+
+    # Unchanged parameters are served from the last render
+    assert renderer.render(copy.deepcopy(edited)) is y
+
+
+def test_dirtyrange():
+    renderer = incremental.IncrementalKlatt()
+    parms = parameters()
+    edited = copy.deepcopy(parms)
+    edited.FF[20, 1] += 200
+    old, new = stream.synthengine(parms), stream.synthengine(edited)
+    start, stop = renderer.dirtyrange(old, new)
+    # Point 20 of 40 sits near the middle; only its neighbourhood changes
+    n_samples = new.n_samples
+    assert 0.4*n_samples < start < stop < 0.6*n_samples
+    assert renderer.dirtyrange(old, stream.synthengine(parms)) is None
+
+
+def test_fixed_field_change_renders_all():
+    renderer = incremental.IncrementalKlatt()
+    parms = parameters()
+    renderer.render(parms)
+    edited = copy.deepcopy(parms)
+    edited.F0 = 120
+    y = renderer.render(edited)
+    assert renderer.full_renders == 2
+    assert renderer.partial_renders == 0
+    np.testing.assert_array_equal(y, klattmake(edited))
+
+
+def test_bandwidth_change_renders_all():
+    # A bandwidth slider moves every segment, so nothing can be reused
+    renderer = incremental.IncrementalKlatt()
+    parms = parameters()
+    renderer.render(parms)
+    edited = copy.deepcopy(parms)
+    edited.BW[:, 1] = 150
+    y = renderer.render(edited)
+    assert renderer.rendered_samples == round(parms.dur*parms.synth_fs)
+    assert_within_tolerance(renderer, y, klattmake(edited))
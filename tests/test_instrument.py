@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage memory is the peak a stage allocated, also for nested stages, and
+instrumentation leaves tracemalloc as it found it.
+
+version: 0.1.0
+"""
+
+import tracemalloc
+import numpy as np
+import pytest
+from controller import instrument
+
+
+@pytest.fixture
+def traced():
+    instrument.reset()
+    instrument.enable(trace_memory=True)
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def allocate(nbytes):
+    # A temporary that is freed before the stage ends
+    return float(np.ones(nbytes//8).sum())
+
+
+def test_temporaries_count(traced):
+    with instrument.stage("outer"):
+        allocate(4*2**20)
+        with instrument.stage("inner"):
+            allocate(8*2**20)
+        allocate(2*2**20)
+    stats = instrument.summary()
+    assert stats["inner"]["bytes"] >= 8*2**20
+    assert stats["outer"]["bytes"] >= 8*2**20
+    assert stats["outer"]["bytes"] < 9*2**20
+
+
+def test_outer_peak_before_inner(traced):
+    with instrument.stage("outer"):
+        allocate(16*2**20)
+        with instrument.stage("inner"):
+            pass
+    stats = instrument.summary()
+    assert stats["outer"]["bytes"] >= 16*2**20
+    assert stats["inner"]["bytes"] < 2**20
+
+
+def test_disable_keeps_foreign_tracing():
+    tracemalloc.start()
+    try:
+        instrument.enable(trace_memory=True)
+        instrument.disable()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    instrument.enable(trace_memory=True)
+    instrument.disable()
+    assert not tracemalloc.is_tracing()
+    instrument.reset()
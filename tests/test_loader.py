@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The chunked resampler reproduces scipy.signal.resample_poly on the whole
+signal, and loadwav() reads files through it.
+
+version: 0.1.0
+"""
+
+import numpy as np
+import pytest
+from scipy import signal
+from scipy.io import wavfile
+from controller import loader
+
+
+RATES = [(22050, 10000), (44100, 10000), (8000, 10000), (48000, 16000),
+         (10000, 22050)]
+
+
+def chunked(resampler, x, chunk_size):
+    pieces = [resampler.process(x[start:start+chunk_size])
+              for start in range(0, len(x), chunk_size)]
+    pieces.append(resampler.flush())
+    return np.concatenate(pieces)
+
+
+@pytest.mark.parametrize("old_fs, new_fs", RATES)
+@pytest.mark.parametrize("chunk_size", [7, 100, 4096, None])
+def test_matches_resample_poly(old_fs, new_fs, chunk_size):
+    x = np.random.default_rng(0).standard_normal(old_fs//4 + 13)
+    resampler = loader.PolyphaseResampler(old_fs, new_fs)
+    if chunk_size == 7:
+        # Shorter than the filter of every ratio here
+        assert chunk_size < resampler.n_taps
+    y = chunked(resampler, x, chunk_size or len(x))
+    reference = signal.resample_poly(x, resampler.up, resampler.down)
+    assert len(y) == len(reference) == resampler.outputs(len(x))
+    np.testing.assert_allclose(y, reference, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_loadwav(tmp_path, channels):
+    rng = np.random.default_rng(1)
+    data = (rng.standard_normal([5000, channels])*3000).astype(np.int16)
+    path = str(tmp_path/"sound.wav")
+    wavfile.write(path, 22050, data if channels > 1 else data[:, 0])
+    reports = []
+    waveform, fs = loader.loadwav(path, 10000, chunk_size=1000,
+                                  report=reports.append)
+    assert fs == 10000
+    reference = signal.resample_poly(data.mean(axis=1), 200, 441)
+    np.testing.assert_allclose(waveform, reference, rtol=0, atol=1e-9)
+    assert reports[-1] == 1
+
+
+def test_load_job_builds_sound(tmp_path):
+    import model
+    from controller import worker
+    data = (np.random.default_rng(2).standard_normal(8000)*3000)
+    path = str(tmp_path/"sound.wav")
+    wavfile.write(path, 22050, data.astype(np.int16))
+    results = []
+    pool = worker.Worker(lambda job, result: results.append(result))
+    pool.submit("load", worker.load, path, 10000, "int16", None)
+    pool.wait("load")
+    pool.shutdown()
+    sound, = results
+
+    loaded = model.Model().loaded_sound
+    version = loaded.version
+    loaded.adopt(sound)
+    assert loaded.data.dtype == np.int16
+    assert loaded.fs == 10000
+    assert loaded.version == version + 1
+    # The overview came from the worker, not from the GUI thread
+    assert loaded._overview is sound._overview is not None
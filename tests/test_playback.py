@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playback through the NullBackend: the ring buffer, both sources, underruns
+and the gain estimate for streamed synthesis.
+
+version: 0.1.0
+"""
+
+import threading
+import numpy as np
+import pytest
+from controller import playback
+from controller.synth import klatt, stream
+
+
+FS = 10000
+
+
+class GatedEngine:
+    """
+    Renders a ramp, but only once gate is set; raises error instead if
+    given.
+    """
+    def __init__(self, n_samples, error=None):
+        self.n_samples = n_samples
+        self.position = 0
+        self.gate = threading.Event()
+        self.error = error
+
+    @property
+    def done(self):
+        return self.position >= self.n_samples
+
+    def render(self, n):
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        start = self.position
+        self.position = min(start + n, self.n_samples)
+        return np.arange(start, self.position)/self.n_samples
+
+
+def tracks():
+    # Glides in F1 and F2, as drawn in the editor
+    formants = np.ones([40, 1])*np.array([800, 1600, 2400, 3200, 4000])
+    formants[:, 0] = np.linspace(300, 850, 40)
+    formants[:, 1] = np.linspace(2300, 900, 40)
+    bandwidths = np.array([[50, 100, 100, 200, 250], [50, 100, 100, 200, 250]])
+    return formants, bandwidths
+
+
+def readall(source, block=1000):
+    out = np.zeros([block], dtype=np.float32)
+    chunks = []
+    while not source.done:
+        n = source.read(out)
+        chunks.append(out[:n].copy())
+    return np.concatenate(chunks)
+
+
+def test_ringbuffer_wraparound():
+    ring = playback.RingBuffer(8)
+    out = np.zeros([8], dtype=np.float32)
+    assert ring.write(np.arange(5)) == 5
+    assert ring.read(out[:3]) == 3
+    np.testing.assert_array_equal(out[:3], [0, 1, 2])
+    # Wraps past the end of the storage; only 6 of 7 fit
+    assert ring.write(np.arange(5, 12)) == 6
+    assert ring.space == 0
+    assert ring.read(out) == 8
+    np.testing.assert_array_equal(out, np.arange(3, 11))
+    assert ring.read(out) == 0
+
+
+def test_arraysource_gain():
+    waveform = np.array([0.5, -2.0, 1.0, 0.25])
+    backend = playback.NullBackend()
+    player = playback.Player(backend, blocksize=3)
+    player.play(playback.ArraySource(waveform), FS)
+    played = backend.streams[0].pump()
+    np.testing.assert_allclose(played[:4], waveform*0.9/2.0, rtol=1e-6)
+    np.testing.assert_array_equal(played[4:], 0)
+    assert not player.playing
+
+
+@pytest.mark.parametrize("voicing", [1, 0])
+def test_streamsource_matches_klattmake(voicing):
+    formants, bandwidths = tracks()
+    args = (formants, bandwidths, np.array([0, 1, 1, 1, 0]), 100, voicing, 5,
+            0.8, FS, 0)
+    reference = klatt.klattmake(*args, rng=0)
+    source = playback.StreamSource(stream.KlattStream(*args, rng=0),
+                                   capacity=3000)
+    source.start()
+    played = readall(source)
+    assert len(played) == len(reference)
+    np.testing.assert_allclose(played, reference*source.gain, rtol=0,
+                               atol=1e-6)
+
+
+def test_underrun_plays_silence():
+    engine = GatedEngine(5000)
+    backend = playback.NullBackend()
+    player = playback.Player(backend, blocksize=512)
+    player.play(playback.StreamSource(engine, gain=1.0, block_size=1000), FS)
+    stream_ = backend.streams[0]
+    # Nothing rendered yet: silence, but the stream keeps going
+    silence = stream_.pump(3)
+    np.testing.assert_array_equal(silence, 0)
+    assert stream_.active
+    engine.gate.set()
+    player.source.thread.join(5)
+    played = stream_.pump()
+    assert not stream_.active
+    np.testing.assert_allclose(played[3*512:3*512+5000],
+                               np.arange(5000)/5000, rtol=1e-6)
+
+
+def test_render_error_ends_playback():
+    errors = []
+    engine = GatedEngine(5000, error=RuntimeError("boom"))
+    engine.gate.set()
+    backend = playback.NullBackend()
+    player = playback.Player(backend, blocksize=512)
+    source = playback.StreamSource(engine, gain=1.0, failed=errors.append)
+    player.play(source, FS)
+    source.thread.join(5)
+    assert source.done
+    assert isinstance(source.error, RuntimeError)
+    assert errors == [source.error]
+    backend.streams[0].pump()
+    assert not backend.streams[0].active
+
+
+@pytest.mark.parametrize("voicing", [1, 0])
+@pytest.mark.parametrize("radiation", [0, 1])
+@pytest.mark.parametrize("envelope", [[0.1, 1, 1, 1, 1], [1, 0.5, 0.2, 1, 0.3],
+                                      [0, 1, 1, 1, 0]])
+def test_peakestimate_covers_peak(voicing, radiation, envelope):
+    formants, bandwidths = tracks()
+    args = (formants, bandwidths, np.array(envelope), 100, voicing, 5, 1.0,
+            FS, radiation)
+    peak = np.max(np.abs(klatt.klattmake(*args, rng=0)))
+    estimate = stream.peakestimate(stream.KlattStream(*args, rng=0))
+    assert peak <= estimate < 3*peak
+
+
+def test_peakestimate_sine():
+    formants, _ = tracks()
+    envelope = np.array([0, 1, 0.5])
+    engine = stream.SineStream(formants, envelope, 0.5, FS)
+    assert stream.peakestimate(engine) == 5
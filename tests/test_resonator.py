@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parity of the resonator kernels with the original per-sample
+klattresonate()/klattantiresonate() loops, which are kept here as the
+reference. The only changes are the dropped local imports and 1-D
+coefficient arrays, since current numpy no longer assigns a (1,) row to an
+element of y.
+
+version: 0.1.0
+"""
+
+import math
+import numpy as np
+import pytest
+from controller.synth import resonator
+
+
+FS = 10000
+N_SAMPLES = 3000
+
+
+def referenceresonate(x, param, Fs):
+    dt = 1/Fs
+    n_samples = x.size
+    y = np.zeros([n_samples])
+    frequency = param[:,0]
+    bandwidth = param[:,1]
+    A = np.zeros([n_samples])
+    B = np.zeros([n_samples])
+    C = np.zeros([n_samples])
+    for i in range(0,n_samples):
+        C[i] = -math.exp(-2*math.pi*bandwidth[i]*dt)
+        B[i] = (2*math.exp(-math.pi*bandwidth[i]*dt)
+                *math.cos(2*math.pi*frequency[i]*dt))
+        A[i] = 1-B[i]-C[i]
+    y[0] = A[0] * x[0]
+    y[1] = A[1] * x[1] - (-B[1])*y[0]
+    for n in range(2,n_samples):
+        y[n] = (A[n] * x[n]) - ((-B[n]) * y[n-1]) - ((-C[n]) * y[n-2])
+    return(y)
+
+
+def referenceantiresonate(x, param, Fs):
+    dt = 1/Fs
+    n_samples = x.size
+    y = np.zeros([n_samples])
+    frequency = param[:,0]
+    bandwidth = param[:,1]
+    A = np.zeros([n_samples])
+    B = np.zeros([n_samples])
+    C = np.zeros([n_samples])
+    A_prime = np.zeros([n_samples])
+    B_prime = np.zeros([n_samples])
+    C_prime = np.zeros([n_samples])
+    for i in range(0,n_samples):
+        C[i] = -math.exp(-2*math.pi*bandwidth[i]*dt)
+        B[i] = (2*math.exp(-math.pi*bandwidth[i]*dt)
+                *math.cos(2*math.pi*frequency[i]*dt))
+        A[i] = 1-B[i]-C[i]
+        A_prime[i] = 1/A[i]
+        B_prime[i] = (-B[i])/A[i]
+        C_prime[i] = (-C[i])/A[i]
+    y[0] = A_prime[0] * x[0]
+    y[1] = A_prime[1] * x[1] - (-B_prime[1])*y[0]
+    for n in range(2,n_samples):
+        y[n] = A_prime[n] * x[n] + B_prime[n] * y[n-1] + C_prime[n] * y[n-2]
+    return(y)
+
+
+def signal():
+    return np.random.default_rng(0).standard_normal(N_SAMPLES)
+
+
+def steps(values, n_samples=N_SAMPLES, n_steps=60):
+    """
+    A per-sample parameter track holding each of values for n_steps
+    samples in turn, like the output of klattinterpolate().
+    """
+    track = np.repeat(values, n_steps)
+    return np.resize(track, n_samples)
+
+
+def param(frequency, bandwidth):
+    return np.column_stack((frequency, bandwidth))
+
+
+def assert_parity(y, reference):
+    scale = np.max(np.abs(reference))
+    np.testing.assert_allclose(y, reference, rtol=0, atol=1e-10*scale)
+
+
+def test_twopole_resonator(backend):
+    x = signal()
+    frequency = steps(np.linspace(300, 3500, 25))
+    bandwidth = steps(np.linspace(40, 300, 25))
+    A, B, C = resonator.resonatorcoeffs(frequency, bandwidth, FS)
+    y, _ = resonator.twopole(x, A, B, C, backend=backend)
+    assert_parity(y, referenceresonate(x, param(frequency, bandwidth), FS))
+
+
+def test_twopole_antiresonator(backend):
+    x = signal()
+    frequency = np.full(N_SAMPLES, 1500.0)
+    bandwidth = np.full(N_SAMPLES, 6000.0)
+    A, B, C = resonator.antiresonatorcoeffs(frequency, bandwidth, FS)
+    y, _ = resonator.twopole(x, A, B, C, backend=backend)
+    reference = referenceantiresonate(x, param(frequency, bandwidth), FS)
+    assert_parity(y, reference)
+
+
+def test_twopole_in_pieces(backend):
+    x = signal()
+    frequency = steps(np.linspace(500, 900, 25))
+    bandwidth = np.full(N_SAMPLES, 80.0)
+    A, B, C = resonator.resonatorcoeffs(frequency, bandwidth, FS)
+    reference = referenceresonate(x, param(frequency, bandwidth), FS)
+
+    pieces = []
+    state = None
+    for start in range(0, N_SAMPLES, 1000):
+        stop = start + 1000
+        y, state = resonator.twopole(x[start:stop], A[start:stop],
+                                     B[start:stop], C[start:stop],
+                                     state=state, backend=backend)
+        pieces.append(y)
+    assert_parity(np.concatenate(pieces), reference)
+
+
+def test_cascade(backend):
+    # Five formants as in klattsynthesize(), segment coefficients
+    x = signal()
+    formants = np.column_stack([steps(np.linspace(f0, f1, 25))
+                                for f0, f1 in ((500, 800), (1800, 1200),
+                                               (2500, 2500), (3300, 3500),
+                                               (3700, 4000))])
+    bandwidths = np.ones([N_SAMPLES, 1])*np.array([50, 100, 100, 200, 250])
+    reference = x
+    for j in range(formants.shape[1]):
+        reference = referenceresonate(reference, param(formants[:, j],
+                                                       bandwidths[:, j]), FS)
+
+    bounds = np.arange(0, N_SAMPLES+1, 60)
+    A, B, C = resonator.resonatorcoeffs(formants[bounds[:-1]],
+                                        bandwidths[bounds[:-1]], FS)
+    y, _ = resonator.cascade(x, A, B, C, bounds, backend=backend)
+    assert_parity(y, reference)
+
+    # Per-sample coefficients take the same path
+    A, B, C = resonator.resonatorcoeffs(formants, bandwidths, FS)
+    y, _ = resonator.cascade(x, A, B, C, backend=backend)
+    assert_parity(y, reference)
+
+
+def test_cascadebatch(backend):
+    x = np.random.default_rng(1).standard_normal([3, N_SAMPLES])
+    bounds = np.arange(0, N_SAMPLES+1, 100)
+    n_segments = len(bounds) - 1
+    second = np.array([1200.0, 1500.0, 1800.0])
+    formants = np.empty([n_segments, 3, 2])
+    formants[:, :, 0] = np.linspace(500, 800, n_segments)[:, None]
+    formants[:, :, 1] = second
+    A, B, C = resonator.resonatorcoeffs(formants,
+                                        np.full(formants.shape, 100.0), FS)
+    y, _ = resonator.cascadebatch(x, A, B, C, bounds, backend=backend)
+
+    for i in range(3):
+        reference = x[i]
+        for j in range(2):
+            frequency = np.repeat(formants[:, i, j], np.diff(bounds))
+            reference = referenceresonate(
+                reference, param(frequency, np.full(N_SAMPLES, 100.0)), FS)
+        assert_parity(y[i], reference)
+
+
+def test_klatt_wrappers(backend):
+    from controller.synth import klatt
+    x = signal()
+    resonance = param(steps(np.linspace(500, 800, 25)),
+                      np.full(N_SAMPLES, 80.0))
+    antiresonance = param(np.full(N_SAMPLES, 1500.0),
+                          np.full(N_SAMPLES, 6000.0))
+    assert_parity(klatt.klattresonate(x, resonance, FS),
+                  referenceresonate(x, resonance, FS))
+    assert_parity(klatt.klattantiresonate(x, antiresonance, FS),
+                  referenceantiresonate(x, antiresonance, FS))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sound storage must always hand out float samples, whatever the scale.
+
+version: 0.1.0
+"""
+
+import numpy as np
+import pytest
+import model
+
+
+@pytest.mark.parametrize("waveform", [[0.0, 32767.0, -100.5],
+                                      [0.0, 0.0, 0.0],
+                                      [0.25, -1.0, 0.5]])
+def test_int16_samples_are_float(waveform):
+    sound = model.Sound(waveform, 10000, 1, "int16")
+    assert sound.data.dtype == np.int16
+    assert sound.waveform.dtype == np.float32
+    assert sound.samples(dtype=np.float64).dtype == np.float64
+    np.testing.assert_allclose(sound.waveform, waveform,
+                               atol=max(sound.scale/2, 1e-12)*1.0001)
+
+
+def test_float_storage_is_not_copied():
+    x = np.linspace(-1, 1, 10)
+    sound = model.Sound(x, 10000, 1)
+    assert np.shares_memory(sound.waveform, x)
+    assert sound.samples(2, 5).dtype == np.float64
+    assert model.Sound(x, 10000, 1, "float32").waveform.dtype == np.float32
+
+
+def test_sequences_are_accepted():
+    sound = model.Sound([0.1, 0.2], 10000, 1)
+    np.testing.assert_array_equal(sound.waveform, [0.1, 0.2])
+    assert sound.nsamples == 2
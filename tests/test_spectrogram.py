@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The model's spectrogram cache keeps only current versions and stays within
+its byte budget.
+
+version: 0.1.0
+"""
+
+import numpy as np
+import model
+
+
+def test_new_version_drops_old():
+    m = model.Model()
+    sound = m.synth_sound
+    for seed in range(3):
+        sound.waveform = np.random.default_rng(seed).standard_normal(5000)
+        key = m.spectrogramKey(sound, 256)
+        m.getSpectrogram(key, sound.data)
+        m.getSpectrogram(m.spectrogramKey(sound, 512), sound.data)
+    assert sorted(m.spectrograms) == sorted([key,
+                                             m.spectrogramKey(sound, 512)])
+
+
+def test_byte_budget():
+    m = model.Model()
+    x = np.random.default_rng(0).standard_normal(20000)
+    one = model.Spectrogram(x, 256, 192, 10000).nbytes
+    m.max_spectrogram_bytes = 3*one
+    sounds = [model.Sound(x, 10000, 1) for _ in range(5)]
+    for sound in sounds:
+        m.getSpectrogram(m.spectrogramKey(sound, 256), sound.data)
+    assert len(m.spectrograms) == 3
+    assert sum(spec.nbytes for spec in m.spectrograms.values()) <= 3*one
+    # The most recent ones are kept
+    assert m.spectrogramKey(sounds[-1], 256) in m.spectrograms
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker keeps one live job per kind, stops cancelled jobs at their next
+report() and cancels everything on shutdown.
+
+version: 0.1.0
+"""
+
+import threading
+import pytest
+from controller import worker
+
+
+class Recorder:
+    def __init__(self):
+        self.finished = []
+        self.progress = []
+        self.failed = []
+        self.done = threading.Event()
+
+    def worker(self):
+        return worker.Worker(self.finish, self.report, self.fail)
+
+    def report(self, job, fraction):
+        self.progress.append((job, fraction))
+
+    def finish(self, job, result):
+        self.finished.append((job, result))
+        self.done.set()
+
+    def fail(self, job, error):
+        self.failed.append((job, error))
+        self.done.set()
+
+
+def blocking(job, started, release, reached):
+    """
+    Reports progress until released, then reports once more; reached is
+    set if that last report() returned.
+    """
+    job.report(0)
+    started.set()
+    release.wait(5)
+    job.report(1)
+    reached.set()
+    return "done"
+
+
+def test_submit_replaces_job_of_same_kind():
+    recorder = Recorder()
+    pool = recorder.worker()
+    started, release, reached = (threading.Event() for _ in range(3))
+    first = pool.submit("synth", blocking, started, release, reached)
+    assert started.wait(5)
+    assert pool.current("synth") is first
+
+    second = pool.submit("synth", lambda job: "second")
+    assert first.cancelled
+    pool.wait("synth")
+    assert recorder.done.wait(5)
+
+    # The cancelled job stops at its next report() and never finishes
+    release.set()
+    first.future.result(5)
+    assert not reached.is_set()
+    assert recorder.finished == [(second, "second")]
+    assert pool.current("synth") is None
+    pool.shutdown()
+
+
+def test_kinds_are_independent():
+    recorder = Recorder()
+    pool = recorder.worker()
+    started, release, reached = (threading.Event() for _ in range(3))
+    synth = pool.submit("synth", blocking, started, release, reached)
+    assert started.wait(5)
+    pool.submit("plot", lambda job: "plot")
+    pool.wait("plot")
+    assert not synth.cancelled
+    release.set()
+    pool.wait("synth")
+    assert reached.is_set()
+    assert sorted(result for _, result in recorder.finished) == ["done",
+                                                                 "plot"]
+    pool.shutdown()
+
+
+def test_cancelled_raises_in_report():
+    job = worker.Job(worker.Worker(), "synth")
+    job.report(0.5)
+    job.cancel()
+    with pytest.raises(worker.Cancelled):
+        job.report(0.6)
+    job.worker.shutdown()
+
+
+def test_errors_reach_failed():
+    recorder = Recorder()
+    pool = recorder.worker()
+    def broken(job):
+        raise ValueError("bad")
+    job = pool.submit("load", broken)
+    assert recorder.done.wait(5)
+    assert recorder.failed[0][0] is job
+    assert isinstance(recorder.failed[0][1], ValueError)
+    pool.shutdown()
+
+
+def test_shutdown_cancels_running_jobs():
+    recorder = Recorder()
+    pool = recorder.worker()
+    started, release, reached = (threading.Event() for _ in range(3))
+    job = pool.submit("synth", blocking, started, release, reached)
+    assert started.wait(5)
+    threading.Timer(0.1, release.set).start()
+    pool.shutdown()
+    assert job.cancelled
+    assert not reached.is_set()
+    assert recorder.finished == []
+    with pytest.raises(RuntimeError):
+        pool.submit("synth", lambda job: None)
@@ -13,7 +13,6 @@ import matplotlib
 matplotlib.use("Qt5Agg")
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigCanvas
-from scipy.io import wavfile
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget,
                              QHBoxLayout,  QVBoxLayout, QGridLayout,
@@ -213,6 +212,23 @@ class WaveCanvas(FigCanvas):
         self.ax.yaxis.set_visible(False)
         FigCanvas.__init__(self, self.fig)
         self.setParent(parent)
+        self.wave = None
+
+    def updateWaveform(self, overview, start, stop):
+        """
+        Draws samples start to stop from a model.WaveformOverview, at most
+        about 2 points per pixel column, through a single line artist.
+        """
+        n_columns = max(1, int(self.ax.bbox.width))
+        x, y = overview.envelope(start, stop, n_columns)
+        if self.wave is None:
+            self.wave, = self.ax.plot(x, y)
+        else:
+            self.wave.set_data(x, y)
+        margin = 0.05*max(overview.high - overview.low, 1e-12)
+        self.ax.set_ylim(overview.low - margin, overview.high + margin)
+        self.ax.set_xlim(start, stop)
+        self.fig.canvas.draw()
 
 
 class STFTCanvas(FigCanvas):
@@ -273,12 +289,39 @@ class SpecCanvas(FigCanvas):
         self.inv = self.ax.transData.inverted()
         self.background = None
         self.x_high = 39
+        # Visible time span when zoomed in, otherwise None
+        self.x_view = None
+        self.spec_image = None
+        self.spec_shown = None
 
 
     def mouse(self, event):
         x_loc, y_loc = self.inv.transform((event.x, event.y))
         if 0 < x_loc < 1 and 0 < y_loc < 1:
-            return self.x_high*x_loc, 5000*y_loc
+            x_low, x_high = self.viewLimits()
+            return x_low + (x_high - x_low)*x_loc, 5000*y_loc
+
+    def viewLimits(self):
+        return self.x_view or (0, self.x_high)
+
+    def viewColumns(self):
+        """
+        Width of the plot area in pixels.
+        """
+        return max(1, int(self.ax.bbox.width))
+
+    def setView(self, x_low, x_high):
+        """
+        Zooms the time axis to x_low..x_high, clipped to the sound; the full
+        span resets the zoom.
+        """
+        span = min(x_high - x_low, self.x_high)
+        x_low = min(max(0, x_low), self.x_high - span)
+        if span >= self.x_high:
+            self.x_view = None
+        else:
+            self.x_view = (x_low, x_low + span)
+        self.rescaleTracks()
 
     def startTracks(self, tracks):
         """
@@ -295,8 +338,33 @@ class SpecCanvas(FigCanvas):
         self.ax.set_xlim(0, self.x_high)
         self.ax.set_ylim(0, 5000)
     
+    def updateSpectrogram(self, spec, cmap):
+        """
+        Shows a model.Spectrogram through a single image artist that is
+        reused from plot to plot. Returns False if spec is already shown, in
+        which case nothing needs to be redrawn.
+        """
+        if spec is self.spec_shown:
+            return False
+        if self.spec_image is None:
+            self.spec_image = self.ax.imshow(spec.Z, extent=spec.extent,
+                                             origin="lower", aspect="auto",
+                                             cmap=cmap, zorder=0)
+        else:
+            self.spec_image.set_data(spec.Z)
+            self.spec_image.set_extent(spec.extent)
+            self.spec_image.autoscale()
+        self.spec_shown = spec
+        return True
+
     def updateTrack(self, trackNo, updated_track):
-        self.tracks[trackNo][0].set_ydata(updated_track)
+        line = self.tracks[trackNo][0]
+        if len(updated_track) == len(line.get_xdata()):
+            line.set_ydata(updated_track)
+        else:
+            npoints = len(updated_track)
+            line.set_data(np.arange(npoints)*(self.x_high/npoints),
+                          updated_track)
         
     def getBackground(self):
         self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
@@ -315,12 +383,13 @@ class SpecCanvas(FigCanvas):
         """
         Changes the x-data in the tracks to scale them visually in the x-dimension
         """
-        self.ax.set_xlim(0, self.x_high)
+        self.ax.set_xlim(*self.viewLimits())
         self.ax.set_ylim(0, 5000)
         self.fig.canvas.draw()
         self.getBackground()
         for i in range(len(self.tracks)):
-            self.tracks[i][0].set_xdata(np.arange(0, self.x_high, self.x_high/40))
+            npoints = len(self.tracks[i][0].get_ydata())
+            self.tracks[i][0].set_xdata(np.arange(npoints)*(self.x_high/npoints))
         self.redrawTracks()
         
 